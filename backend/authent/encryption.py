@@ -1,6 +1,17 @@
+import base64
+import os
+import zlib
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from config import settings
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # Encode the key
 fernet = Fernet(settings.ENCRYPTION_KEY.encode())
 
@@ -12,3 +23,95 @@ def encrypt_token(token: str) -> bytes:
 def decrypt_token(encrypted_token: bytes) -> str:
     return fernet.decrypt(encrypted_token).decode()
 
+# Email body envelope: MAGIC | version | codec | 12-byte nonce | AES-GCM ciphertext and tag.
+# Fernet tokens always start with "g", so the magic never collides with legacy rows
+BODY_MAGIC = b"EB"
+BODY_VERSION = 1
+NONCE_SIZE = 12
+
+# Compression codecs recorded in the envelope header
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_ZSTD_DICT = 3
+
+# Derive a purpose-specific AES-GCM key from the Fernet key, so no new secret needs to be configured
+def derive_aead_key(info: bytes) -> AESGCM:
+    return AESGCM(HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=info
+    ).derive(base64.urlsafe_b64decode(settings.ENCRYPTION_KEY)))
+
+_body_key = derive_aead_key(b"email.ing body envelope v1")
+
+_zstd_dict = None
+
+def _get_zstd_dict():
+    """
+    Loads the optional trained zstd dictionary from BODY_ZSTD_DICT_PATH
+    """
+    global _zstd_dict
+    if _zstd_dict is None and zstandard and settings.BODY_ZSTD_DICT_PATH:
+        with open(settings.BODY_ZSTD_DICT_PATH, "rb") as f:
+            _zstd_dict = zstandard.ZstdCompressionDict(f.read())
+    return _zstd_dict
+
+def _compress(data: bytes):
+    """
+    Compresses with zstd (using the trained dictionary if configured), falling back to zlib
+    """
+    if zstandard is None:
+        return CODEC_ZLIB, zlib.compress(data, 6)
+
+    zstd_dict = _get_zstd_dict()
+    if zstd_dict is not None:
+        return CODEC_ZSTD_DICT, zstandard.ZstdCompressor(level=settings.BODY_ZSTD_LEVEL, dict_data=zstd_dict).compress(data)
+    return CODEC_ZSTD, zstandard.ZstdCompressor(level=settings.BODY_ZSTD_LEVEL).compress(data)
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    """
+    Reverses _compress for the codec recorded in the envelope
+    """
+    if codec == CODEC_NONE:
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to decode this email body")
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZSTD_DICT:
+        zstd_dict = _get_zstd_dict()
+        if zstd_dict is None or zstd_dict.dict_id() != zstandard.get_frame_parameters(data).dict_id:
+            raise RuntimeError("Email body was compressed with a zstd dictionary that is not configured")
+        return zstandard.ZstdDecompressor(dict_data=zstd_dict).decompress(data)
+    raise ValueError(f"Unknown body codec {codec}")
+
+def is_legacy_body(encrypted_body: bytes) -> bool:
+    """
+    Checks whether a stored body still uses the original Fernet format
+    """
+    return not encrypted_body.startswith(BODY_MAGIC)
+
+# Encrypt email body: compress, then AES-GCM into a raw binary envelope
+def encrypt_body(body: str) -> bytes:
+    codec, compressed = _compress(body.encode())
+    header = BODY_MAGIC + bytes([BODY_VERSION, codec])
+    nonce = os.urandom(NONCE_SIZE)
+    return header + nonce + _body_key.encrypt(nonce, compressed, header)
+
+# Decrypt email body, transparently handling legacy Fernet rows
+def decrypt_body(encrypted_body: bytes) -> str:
+    if is_legacy_body(encrypted_body):
+        return decrypt_token(encrypted_body)
+
+    header = encrypted_body[:len(BODY_MAGIC) + 2]
+    version, codec = header[len(BODY_MAGIC)], header[len(BODY_MAGIC) + 1]
+    if version != BODY_VERSION:
+        raise ValueError(f"Unknown body envelope version {version}")
+
+    nonce = encrypted_body[len(header):len(header) + NONCE_SIZE]
+    compressed = _body_key.decrypt(nonce, encrypted_body[len(header) + NONCE_SIZE:], header)
+    return _decompress(codec, compressed).decode()
@@ -1,15 +1,80 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from config import settings
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 from db.models import User
+from db.redis_client import get_redis
+from redis.exceptions import LockError
 from .encryption import decrypt_token, encrypt_token
 from fastapi import HTTPException
 
-def get_gmail_service(db: Session, user: User):
+# Parsed Gmail discovery document, loaded once from the copy bundled with google-api-python-client
+_gmail_discovery_doc = None
+
+# Built service objects per user. httplib2 connections are not thread-safe, so each thread keeps its own cache
+_service_cache = threading.local()
+
+def _get_gmail_discovery_doc() -> dict:
     """
-    Retrieves, decrypts, and possibly refreshes the user's Google tokens. Returns an initialized Gmail API service object
+    Loads the bundled Gmail discovery document without any network fetch
+    """
+    global _gmail_discovery_doc
+    if _gmail_discovery_doc is None:
+        doc = discovery_cache.get_static_doc("gmail", "v1")
+        if doc is None:
+            raise RuntimeError("Bundled Gmail discovery document not found")
+        _gmail_discovery_doc = json.loads(doc)
+    return _gmail_discovery_doc
+
+def _get_cached_service(user: User):
+    """
+    Returns the cached service for the user if it was built from the current token and has not expired
+    """
+    cache = getattr(_service_cache, "services", {})
+    entry = cache.get(user.id)
+    if not entry:
+        return None
+
+    token, expires_at, service = entry
+    if token != user.encrypted_access_token or expires_at < time.monotonic():
+        del cache[user.id]
+        return None
+    return service
+
+def _cache_service(user: User, service):
+    """
+    Stores a built service for the user, dropping any expired entries
+    """
+    if not hasattr(_service_cache, "services"):
+        _service_cache.services = {}
+    cache = _service_cache.services
+
+    now = time.monotonic()
+    for user_id in [uid for uid, entry in cache.items() if entry[1] < now]:
+        del cache[user_id]
+
+    # Never keep a service into its token's refresh margin, so refreshes always go through the shared refresher
+    ttl = settings.GMAIL_SERVICE_CACHE_TTL_SECONDS
+    if user.token_expires_at:
+        ttl = min(ttl, (user.token_expires_at - _utcnow()).total_seconds() - settings.TOKEN_REFRESH_MARGIN_SECONDS)
+    cache[user.id] = (user.encrypted_access_token, now + ttl, service)
+
+def _utcnow() -> datetime:
+    """
+    Current time as a naive UTC datetime, matching how token expiries are stored
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _build_credentials(user: User) -> Credentials:
+    """
+    Builds a Credentials object from the user's encrypted tokens
     """
     # Decrypt the tokens stored in the database
     access_token = decrypt_token(user.encrypted_access_token)
@@ -20,32 +85,111 @@ def get_gmail_service(db: Session, user: User):
         refresh_token = decrypt_token(user.encrypted_refresh_token)
 
     # Build the Credentials object
-    creds = Credentials(
+    return Credentials(
         token=access_token,
         refresh_token=refresh_token,
         token_uri='https://oauth2.googleapis.com/token',
         client_id=settings.GOOGLE_CLIENT_ID,
         client_secret=settings.GOOGLE_CLIENT_SECRET,
-        scopes=settings.SCOPES
+        scopes=settings.SCOPES,
+        expiry=user.token_expires_at
+    )
+
+def _token_is_fresh(user: User, margin_seconds: int) -> bool:
+    """
+    Checks whether the stored access token stays valid for at least margin_seconds
+    """
+    return user.token_expires_at is not None and user.token_expires_at > _utcnow() + timedelta(seconds=margin_seconds)
+
+def refresh_access_token(db: Session, user: User, margin_seconds: int = 0) -> Credentials:
+    """
+    Refreshes the user's access token under a per-user Redis lock so only one caller hits Google.
+    Callers that waited on the lock reuse the token the lock holder stored.
+    """
+    lock = get_redis().lock(
+        f"token-refresh:{user.id}",
+        timeout=settings.TOKEN_REFRESH_LOCK_SECONDS,
+        blocking_timeout=settings.TOKEN_REFRESH_LOCK_SECONDS
     )
+    if not lock.acquire():
+        # Another caller is stuck refreshing, so only continue if it already stored a usable token
+        db.refresh(user)
+        if _token_is_fresh(user, margin_seconds):
+            return _build_credentials(user)
+        raise HTTPException(status_code=503, detail="Token refresh in progress, try again shortly")
+
+    try:
+        # Pick up a token refreshed by another worker while we waited
+        db.refresh(user)
+        creds = _build_credentials(user)
+        if _token_is_fresh(user, margin_seconds):
+            return creds
+
+        if not creds.refresh_token:
+            # If we get here, we don't have a refresh token
+            raise HTTPException(status_code=401, detail="No valid refresh token found. Please re-login.")
+
+        try:
+            # Force a refresh via a Request object
+            creds.refresh(Request())
+        except Exception as e:
+            print(f"Failed to refresh token: {e}")
+            # If refresh fails, we likely need a full re-auth
+            raise HTTPException(status_code=401, detail="Refresh token expired or revoked")
+
+        # Update DB
+        user.encrypted_access_token = encrypt_token(creds.token)
+        user.token_expires_at = creds.expiry
+        db.commit()
+        print(f"Successfully refreshed token for user {user.id}")
+        return creds
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # The lock timed out while refreshing and someone else may hold it now
+            pass
+
+def refresh_expiring_tokens(db: Session) -> int:
+    """
+    Refreshes every token that expires within TOKEN_REFRESH_MARGIN_SECONDS, or whose expiry is unknown,
+    so user-facing calls never wait on a refresh
+    """
+    cutoff = _utcnow() + timedelta(seconds=settings.TOKEN_REFRESH_MARGIN_SECONDS)
+    users = db.query(User).filter(
+        User.encrypted_refresh_token.isnot(None),
+        or_(User.token_expires_at.is_(None), User.token_expires_at < cutoff)
+    ).all()
+
+    refreshed = 0
+    for user in users:
+        try:
+            refresh_access_token(db, user, margin_seconds=settings.TOKEN_REFRESH_MARGIN_SECONDS)
+            refreshed += 1
+        except HTTPException as e:
+            print(f"Proactive refresh failed for user {user.id}: {e.detail}")
+    return refreshed
+
+def get_gmail_service(db: Session, user: User):
+    """
+    Retrieves, decrypts, and possibly refreshes the user's Google tokens. Returns an initialized Gmail API service object
+    """
+    # Reuse the service built for this token, skipping credential and discovery setup
+    service = _get_cached_service(user)
+    if service is not None:
+        return service
+
+    creds = _build_credentials(user)
 
-    # Check if token is expired and needs refreshing
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                # Force a refresh via a Request object
-                creds.refresh(Request())
-                
-                # Update DB
-                user.encrypted_access_token = encrypt_token(creds.token)
-                db.commit()
-                print(f"Successfully refreshed token for user {user.id}")
-            except Exception as e:
-                print(f"Failed to refresh token: {e}")
-                # If refresh fails, we likely need a full re-auth
-                raise HTTPException(status_code=401, detail="Refresh token expired or revoked")
-        else:
+    # Refresh ahead of google-auth's own expiry threshold (a few minutes early). Otherwise AuthorizedHttp
+    # would refresh inline, without the lock, and the new token would never be stored
+    if not _token_is_fresh(user, settings.TOKEN_REFRESH_MARGIN_SECONDS):
+        if creds.refresh_token:
+            creds = refresh_access_token(db, user, margin_seconds=settings.TOKEN_REFRESH_MARGIN_SECONDS)
+        elif not creds.valid:
             # If we get here, we don't have a refresh token
             raise HTTPException(status_code=401, detail="No valid refresh token found. Please re-login.")
 
-    return build("gmail", "v1", credentials=creds)
\ No newline at end of file
+    service = build_from_document(_get_gmail_discovery_doc(), credentials=creds)
+    _cache_service(user, service)
+    return service
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""
+Benchmark for the HTML-to-text extractor in services/html_text.py
+
+Compares the original full BeautifulSoup parse against each available extractor backend,
+with the same early-termination budget used by preprocess_batch.
+
+Run from the backend directory, optionally pointing at a folder of real .html emails:
+    python -m benchmarks.bench_html_extract --corpus ~/email-html --budget 3000
+"""
+import argparse
+import pathlib
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from services.html_text import available_backends, extract_text
+
+
+def baseline(html: str, budget: int) -> str:
+    '''
+    The previous preprocessing path: parse everything, then slice
+    '''
+    return BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True)[:budget]
+
+
+def synthetic_marketing_email(rng: random.Random, rows: int) -> str:
+    '''
+    Builds a newsletter-style email: inline styles, hidden preheader, nested layout tables, tracking pixels
+    '''
+    style = "<style>" + "".join(f".c{i}{{color:#{i:06x};padding:{i % 9}px}}" for i in range(300)) + "</style>"
+    preheader = '<div style="display:none;max-height:0;overflow:hidden">Don\'t miss this week\'s deals</div>'
+    cells = []
+    for i in range(rows):
+        words = " ".join(rng.choice(["Sale", "new", "arrivals", "free", "shipping", "members", "save", "today"]) for _ in range(12))
+        cells.append(
+            f'<tr><td class="c{i % 300}"><table width="100%"><tr><td style="font-family:Arial">'
+            f'<a href="https://example.com/track?id={i}"><img src="https://example.com/p/{i}.png" width="1" height="1"></a>'
+            f'<p>{words}</p></td></tr></table></td></tr>'
+        )
+    footer = '<p style="font-size:10px">Unsubscribe | Privacy policy | 123 Market St</p>'
+    return f"<html><head>{style}</head><body>{preheader}<table>{''.join(cells)}</table>{footer}</body></html>"
+
+
+def load_corpus(args) -> list:
+    if args.corpus:
+        return [p.read_text(errors="replace") for p in sorted(pathlib.Path(args.corpus).glob("*.html"))]
+    rng = random.Random(0)
+    return [synthetic_marketing_email(rng, rng.randint(50, args.rows)) for _ in range(args.messages)]
+
+
+def _time(fn, corpus: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in corpus:
+            fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of .html files (defaults to a synthetic corpus)")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=800)
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    total_kb = sum(len(html) for html in corpus) / 1024
+    print(f"{len(corpus)} emails, {total_kb:.0f} KB of HTML, {args.budget} character budget")
+
+    base = _time(lambda html: baseline(html, args.budget), corpus, args.repeat)
+    print(f"{'bs4 full parse':>16}: {base * 1000:8.1f} ms")
+    for backend in available_backends():
+        elapsed = _time(lambda html: extract_text(html, args.budget, backend=backend), corpus, args.repeat)
+        print(f"{backend:>16}: {elapsed * 1000:8.1f} ms ({base / elapsed:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Import-time benchmark for API and worker cold starts
+
+Runs `python -X importtime` on each entry module in a fresh interpreter, reports the
+cumulative import time, the slowest top-level imports, and whether any of the heavy
+AI modules (spaCy, Presidio, the Gemini SDK) were loaded.
+
+Run from the backend directory (with the usual .env settings available):
+    python -m benchmarks.bench_import_time main tasks
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+HEAVY_PREFIXES = ("spacy", "presidio_analyzer", "google.genai", "thinc", "torch")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module: str) -> list:
+    '''
+    Returns (self_us, cumulative_us, depth, name) for every module imported by `import module`
+    '''
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["main", "tasks"])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        rows = import_profile(module)
+        total_ms = sum(self_us for self_us, _, _, _ in rows) / 1000
+        heavy = sorted({name.split(".")[0] for _, _, _, name in rows if name.startswith(HEAVY_PREFIXES)})
+
+        print(f"import {module}: {total_ms:.0f} ms across {len(rows)} modules")
+        print(f"  heavy AI modules loaded: {', '.join(heavy) if heavy else 'none'}")
+        top_level = sorted((row for row in rows if row[2] <= 1), key=lambda row: row[1], reverse=True)
+        for _, cumulative_us, _, name in top_level[:args.top]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
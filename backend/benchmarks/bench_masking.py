@@ -0,0 +1,64 @@
+"""
+Throughput benchmark for PII masking in services/privacy.py
+
+Compares the per-email mask_content loop (run from a thread pool, as the AI task used to)
+against mask_batch, which pushes all texts through spaCy's nlp.pipe together.
+
+Run from the backend directory:
+    python -m benchmarks.bench_masking --emails 200 --batch-sizes 8 32 64 --n-process 1 2
+"""
+import argparse
+import concurrent.futures
+import random
+import time
+
+from services.privacy import mask_batch, mask_content
+
+FIRST_NAMES = ["Maria", "James", "Wei", "Aisha", "Carlos", "Olivia", "Noah", "Priya"]
+LAST_NAMES = ["Garcia", "Smith", "Chen", "Khan", "Lopez", "Brown", "Patel", "Nguyen"]
+
+
+def synthetic_email(rng: random.Random) -> str:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    sentences = [
+        f"Hi {first}, thanks for sending over the quarterly numbers yesterday.",
+        "The review meeting moved to Thursday afternoon, please update the deck before then.",
+        f"You can reach {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} at {first.lower()}.{last.lower()}@example.com.",
+        f"If anything is urgent call me on +1 415-555-{rng.randint(1000, 9999)}.",
+        "Attached are the contract drafts and the updated shipping schedule for next month.",
+    ]
+    body = " ".join(rng.choice(sentences) for _ in range(rng.randint(6, 14)))
+    return f"{body} Best regards, {first} {last}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=5, help="threads for the per-email baseline")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--n-process", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [synthetic_email(rng) for _ in range(args.emails)]
+
+    # Warm up the spaCy pipeline so model loading isn't timed
+    mask_content(texts[0])
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(mask_content, texts))
+    baseline = time.perf_counter() - start
+    print(f"per-email loop ({args.workers} threads): {args.emails / baseline:7.1f} emails/s")
+
+    for n_process in args.n_process:
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            mask_batch(texts, batch_size=batch_size, n_process=n_process)
+            elapsed = time.perf_counter() - start
+            print(f"mask_batch (batch {batch_size:3d}, n_process {n_process}): "
+                  f"{args.emails / elapsed:7.1f} emails/s ({baseline / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
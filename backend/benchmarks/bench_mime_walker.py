@@ -0,0 +1,125 @@
+"""
+Micro-benchmark for the MIME walker in services/email_service.py
+
+Builds a corpus of deeply nested multipart payloads (in Gmail API format) and compares
+the iterative, decode-once walker against the previous recursive walker.
+
+Run from the backend directory:
+    python -m benchmarks.bench_mime_walker --messages 200 --depth 12
+"""
+import argparse
+import base64
+import random
+import time
+
+from services.email_service import get_email_body_content
+
+
+def legacy_get_email_body_content(msg_payload: dict):
+    '''
+    The previous recursive walker, kept here as the baseline. It decodes every text part
+    '''
+    html_body = ""
+    plain_text = ""
+    attachments = []
+
+    def walk_parts(parts):
+        nonlocal html_body, plain_text
+        for part in parts:
+            mime_type = part.get("mimeType")
+            filename = part.get("filename")
+            body = part.get("body", {})
+            data = body.get("data")
+            attachment_id = body.get("attachmentId")
+
+            if mime_type == "text/html" and data:
+                html_body = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
+            elif mime_type == "text/plain" and data:
+                plain_text = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
+            elif filename and attachment_id:
+                attachments.append({
+                    "filename": filename,
+                    "mime_type": mime_type,
+                    "attachment_id": attachment_id,
+                    "size": body.get("size", 0)
+                })
+
+            if "parts" in part:
+                walk_parts(part["parts"])
+
+    walk_parts(msg_payload.get("parts", [msg_payload]))
+    return html_body if html_body else plain_text, attachments
+
+
+def _text_part(mime_type: str, size: int) -> dict:
+    text = ("<td>Quarterly update</td>" if mime_type == "text/html" else "Quarterly update ") * (size // 24 + 1)
+    return {
+        "mimeType": mime_type,
+        "filename": "",
+        "headers": [{"name": "Content-Type", "value": f"{mime_type}; charset=utf-8"}],
+        "body": {"size": size, "data": base64.urlsafe_b64encode(text[:size].encode()).decode()}
+    }
+
+
+def _attachment_part(index: int, inline: bool) -> dict:
+    headers = [{"name": "Content-Disposition", "value": f"{'inline' if inline else 'attachment'}; filename=file{index}.png"}]
+    if inline:
+        headers.append({"name": "Content-ID", "value": f"<image{index}@mail>"})
+    return {
+        "mimeType": "image/png",
+        "filename": f"file{index}.png",
+        "headers": headers,
+        "body": {"size": 2048, "attachmentId": f"att-{index}"}
+    }
+
+
+def build_message(depth: int, body_size: int, rng: random.Random) -> dict:
+    '''
+    Builds a multipart/mixed message nesting `depth` levels of multipart containers,
+    each holding an alternative text/html pair and a couple of attachments
+    '''
+    payload = {"mimeType": "multipart/alternative", "parts": [
+        _text_part("text/plain", body_size), _text_part("text/html", body_size)
+    ]}
+    for level in range(depth):
+        payload = {"mimeType": "multipart/mixed", "parts": [
+            payload,
+            _text_part("text/html", rng.randint(body_size // 4, body_size)),
+            _attachment_part(level, inline=rng.random() < 0.5),
+        ]}
+    return payload
+
+
+def _time(fn, corpus: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in corpus:
+            fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--body-size", type=int, default=64 * 1024)
+    parser.add_argument("--max-body-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = [build_message(args.depth, args.body_size, rng) for _ in range(args.messages)]
+
+    legacy = _time(legacy_get_email_body_content, corpus, args.repeat)
+    iterative = _time(lambda p: get_email_body_content(p, max_body_bytes=args.max_body_bytes), corpus, args.repeat)
+
+    print(f"{args.messages} messages, depth {args.depth}, {args.body_size} byte parts")
+    print(f"recursive walker: {legacy * 1000:8.1f} ms ({legacy / args.messages * 1e6:8.1f} us/message)")
+    print(f"iterative walker: {iterative * 1000:8.1f} ms ({iterative / args.messages * 1e6:8.1f} us/message)")
+    print(f"speedup:          {legacy / iterative:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for the adaptive-concurrency Ollama client in services/ollama_client.py
+
+Replays a batch of classifications against a simulated model server that runs a fixed number of
+generations at a time and queues the rest, so latency rises once the server is saturated.
+Compares fixed concurrency limits with the AIMD limiter and reports throughput and tail latency.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ollama_client --requests 400 --server-slots 6 --service-ms 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from services.ollama_client import AdaptiveLimiter, OllamaClient
+
+
+def simulated_server(slots: int, service_ms: float):
+    '''
+    Mock transport: `slots` requests are served at once, each taking `service_ms`; the rest queue
+    '''
+    semaphore = None
+
+    async def handler(request):
+        nonlocal semaphore
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(slots)
+        async with semaphore:
+            await asyncio.sleep(service_ms / 1000)
+        return httpx.Response(200, json={"response": json.dumps({"category": "Personal", "urgency": "2"})})
+
+    return httpx.MockTransport(handler)
+
+
+async def run_batch(args, limiter: AdaptiveLimiter):
+    client = OllamaClient("http://ollama", "bench", timeout=60, transport=simulated_server(args.server_slots, args.service_ms))
+    client.limiter = limiter
+    latencies = []
+
+    async def one(i):
+        _, seconds = await client.generate(f"email {i}")
+        latencies.append(seconds * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--server-slots", type=int, default=6, help="generations the simulated server runs at once")
+    parser.add_argument("--service-ms", type=float, default=20)
+    parser.add_argument("--tolerance", type=float, default=2.0)
+    args = parser.parse_args()
+
+    configurations = [(f"fixed {n}", AdaptiveLimiter(n, n, n, float("inf"))) for n in (1, 5, 32)]
+    configurations.append(("adaptive", AdaptiveLimiter(4, 1, 32, args.tolerance)))
+
+    for label, limiter in configurations:
+        elapsed, latencies = asyncio.run(run_batch(args, limiter))
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{label:>9}: {args.requests / elapsed:7.1f} req/s, p50 {statistics.median(latencies):6.1f} ms, "
+              f"p95 {p95:6.1f} ms, final limit {limiter.snapshot()['limit']}")
+
+
+if __name__ == "__main__":
+    main()
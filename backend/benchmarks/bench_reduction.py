@@ -0,0 +1,103 @@
+"""
+Benchmark for the content reduction in services/reduction.py
+
+Measures estimated prompt tokens per email before and after dropping quoted replies, signatures,
+footer boilerplate and tracking-link tails, the same way preprocess_batch does. Both sides are
+cut to the prompt budget, so only savings that reach the prompt are counted.
+
+Run from the backend directory, optionally pointing at a folder of real .html emails:
+    python -m benchmarks.bench_reduction --corpus ~/email-html
+"""
+import argparse
+import pathlib
+import random
+import time
+
+from services.html_text import extract_text_parts
+from services.reduction import reduce_text
+from services.tokens import estimate_tokens, truncate_to_tokens
+
+WORDS = ["project", "deadline", "meeting", "review", "budget", "client", "draft", "update", "numbers", "launch"]
+
+
+def _sentences(rng: random.Random, count: int) -> str:
+    return " ".join(" ".join(rng.choice(WORDS) for _ in range(10)).capitalize() + "." for _ in range(count))
+
+
+def synthetic_reply(rng: random.Random, depth: int) -> str:
+    '''
+    Builds a reply thread: a short new message over nested gmail_quote blocks, with a signature
+    '''
+    html = f"<p>{_sentences(rng, 3)}</p><p>--<br>Alex Morgan | Account Manager<br>Acme Inc. | +1 555 0100</p>"
+    quoted = ""
+    for level in range(depth):
+        quoted = (f'<div class="gmail_quote">On Mon, Jan {level + 1}, 2026 at 9:00 AM Sam &lt;sam@example.com&gt; wrote:'
+                  f"<blockquote><p>{_sentences(rng, 6)}</p>{quoted}</blockquote></div>")
+    return f"<html><body>{html}{quoted}</body></html>"
+
+
+def synthetic_newsletter(rng: random.Random, items: int) -> str:
+    '''
+    Builds a newsletter: repeated call-to-action lines, long tracking links and a legal footer
+    '''
+    rows = "".join(
+        f"<p>{_sentences(rng, 2)} Shop now at https://click.example.com/ls/click?upn={rng.getrandbits(256):x}</p>"
+        "<p>Free shipping on orders over $50.</p>"
+        for _ in range(items)
+    )
+    footer = ("<p>You are receiving this email because you signed up at example.com. Unsubscribe or manage your preferences. "
+              "View our privacy policy. © 2026 Example Inc. All rights reserved.</p>")
+    return f"<html><body>{rows}{footer}</body></html>"
+
+
+def synthetic_plain_reply(rng: random.Random) -> str:
+    '''
+    Builds a plain-text reply with "> " quoting and a mobile signature
+    '''
+    quoted = "\n".join(f"> {_sentences(rng, 1)}" for _ in range(12))
+    return f"{_sentences(rng, 2)}\n\nSent from my iPhone\n\nOn Tue, Feb 3, 2026, Sam <sam@example.com> wrote:\n{quoted}"
+
+
+def load_corpus(args) -> list:
+    if args.corpus:
+        return [("corpus", p.read_text(errors="replace")) for p in sorted(pathlib.Path(args.corpus).glob("*.html"))]
+    rng = random.Random(0)
+    corpus = []
+    for _ in range(args.messages):
+        corpus.append(("reply", synthetic_reply(rng, rng.randint(1, 5))))
+        corpus.append(("newsletter", synthetic_newsletter(rng, rng.randint(4, 12))))
+        corpus.append(("plain reply", synthetic_plain_reply(rng)))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of .html files (defaults to a synthetic corpus)")
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=6000, help="extraction window in characters")
+    parser.add_argument("--max-tokens", type=int, default=375, help="prompt budget per email")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    totals = {}
+    start = time.perf_counter()
+    for kind, body in corpus:
+        full, unquoted = extract_text_parts(body, max_chars=args.budget)
+        reduced = reduce_text(unquoted)
+        before, after, count = totals.get(kind, (0, 0, 0))
+        totals[kind] = (
+            before + estimate_tokens(truncate_to_tokens(full, args.max_tokens)),
+            after + estimate_tokens(truncate_to_tokens(reduced, args.max_tokens)),
+            count + 1,
+        )
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(corpus)} emails reduced in {elapsed * 1000:.1f} ms")
+    for kind, (before, after, count) in totals.items():
+        saved = before - after
+        print(f"{kind:>12}: {before / count:7.1f} -> {after / count:7.1f} tokens per email "
+              f"({saved / count:6.1f} saved, {saved / before:5.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for the span-based mask/unmask engine in services/privacy.py
+
+Builds a long text with many repeated entity spans and times the engine against the previous
+slice-per-entity masking and str.replace-per-placeholder unmasking. Its invariants are covered
+by tests/test_privacy_spans.py.
+
+Run from the backend directory:
+    python -m benchmarks.bench_span_masking --length 200000 --entities 5000
+"""
+import argparse
+import random
+import string
+import time
+
+from services.privacy import Span, _apply_mask, deanonymize_text
+
+
+def legacy_mask(text: str, results: list):
+    '''
+    The previous masking loop: rebuilds the whole string for every entity
+    '''
+    pii_map = {}
+    temp_text = text
+    for i, res in enumerate(sorted(results, key=lambda x: x.start, reverse=True)):
+        placeholder = f"<{res.entity_type}_{i}>"
+        pii_map[placeholder] = text[res.start:res.end]
+        temp_text = temp_text[:res.start] + placeholder + temp_text[res.end:]
+    return temp_text, pii_map
+
+
+def legacy_unmask(text: str, pii_map: dict) -> str:
+    for placeholder, real_value in pii_map.items():
+        text = text.replace(placeholder, real_value)
+    return text
+
+
+def random_case(rng: random.Random, length: int, entities: int, overlap_rate: float = 0.1):
+    '''
+    Builds a text and a list of spans over it. Names repeat, and some spans overlap
+    '''
+    names = ["".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(3, 10))) for _ in range(max(1, entities // 10))]
+    words = []
+    spans = []
+    position = 0
+    while position < length:
+        if len(spans) < entities and rng.random() < 0.3:
+            word = rng.choice(names)
+            spans.append(Span(position, position + len(word), rng.choice(["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"])))
+            if rng.random() < overlap_rate:
+                spans.append(Span(position, position + rng.randint(1, len(word)), "PERSON"))
+        else:
+            word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 8)))
+        words.append(word)
+        position += len(word) + 1
+    return " ".join(words), spans
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--length", type=int, default=200_000)
+    parser.add_argument("--entities", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text, spans = random_case(random.Random(1), args.length, args.entities, overlap_rate=0.0)
+    legacy_masked, legacy_map = legacy_mask(text, spans)
+    masked, pii_map = _apply_mask(text, spans)
+    print(f"{len(text)} characters, {len(spans)} entities: "
+          f"{len(legacy_map)} placeholders before, {len(pii_map)} with reuse "
+          f"({len(legacy_masked)} -> {len(masked)} masked characters)")
+
+    for label, old, new in [
+        ("mask", lambda: legacy_mask(text, spans), lambda: _apply_mask(text, spans)),
+        ("unmask", lambda: legacy_unmask(legacy_masked, legacy_map), lambda: deanonymize_text(masked, pii_map)),
+    ]:
+        old_time, new_time = _time(old, args.repeat), _time(new, args.repeat)
+        print(f"{label:>6}: {old_time * 1000:9.1f} ms -> {new_time * 1000:7.1f} ms ({old_time / new_time:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
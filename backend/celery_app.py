@@ -0,0 +1,29 @@
+import os
+from celery import Celery
+from config import settings
+
+# Initialize Celery. Tasks live in tasks.py, which the worker loads. The API only enqueues by name,
+# so it never imports the AI stack
+celery_app = Celery(
+    "email_ing",
+    broker=os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0"),
+    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0"),
+    include=["tasks"]
+)
+
+# Body downloads run on their own queue so they never hold up syncs or AI processing
+celery_app.conf.task_routes = {
+    "fetch_email_bodies": {"queue": "bodies"},
+}
+
+# Periodic tasks run by celery beat
+celery_app.conf.beat_schedule = {
+    "refresh-expiring-tokens": {
+        "task": "refresh_expiring_tokens",
+        "schedule": settings.TOKEN_REFRESH_INTERVAL_SECONDS,
+    },
+    "resummarize-emails": {
+        "task": "resummarize_emails",
+        "schedule": settings.GEMINI_RESUMMARIZE_INTERVAL_SECONDS,
+    },
+}
@@ -18,6 +18,93 @@ class Settings(BaseSettings):
     # Gemini API Key
     GEMINI_API_KEY: str 
 
+    # Gemini summarization batches
+    GEMINI_MODEL: str = "gemini-2.5-flash"
+    GEMINI_BATCH_TOKEN_BUDGET: int = 8000
+    GEMINI_BATCH_MAX_EMAILS: int = 25
+    GEMINI_MAX_RESUBMITS: int = 2
+    GEMINI_RPM: int = 10
+    GEMINI_TPM: int = 250000
+    GEMINI_MAX_WAIT_SECONDS: float = 30
+    GEMINI_QUOTA_RETRY_SECONDS: int = 60
+    GEMINI_OUTPUT_TOKENS_PER_EMAIL: int = 60
+    GEMINI_BREAKER_FAILURES: int = 3
+    GEMINI_BREAKER_COOLDOWN_SECONDS: int = 120
+    GEMINI_SLOW_CALL_SECONDS: float = 60
+    GEMINI_RESUMMARIZE_ENABLED: bool = True
+    GEMINI_RESUMMARIZE_INTERVAL_SECONDS: int = 600
+    AI_BATCH_SIZE: int = 40
+    AI_PIPELINE_QUEUE_SIZE: int = 2
+    AI_PIPELINE_MAX_BATCHES: int = 10
+    AI_PIPELINE_LOCK_SECONDS: int = 1800
+    AI_PIPELINE_RETRY_SECONDS: int = 60
+
+    # AI preprocessing: how much visible text to extract, and the token budget per email in prompts
+    AI_EXTRACT_MAX_CHARS: int = 6000
+    AI_TEXT_MAX_TOKENS: int = 375
+    CONTENT_REDUCTION_ENABLED: bool = True
+    MASK_BATCH_SIZE: int = 32
+    MASK_N_PROCESS: int = 1
+    # "tiered" skips NER on texts without possible names. Keep "ner" until its recall has been measured against full NER
+    MASKING_TIER: str = "ner"
+
+    # Local Ollama classifier
+    OLLAMA_URL: str = "http://ollama:11434"
+    OLLAMA_MODEL: str = "llama3.2"
+    OLLAMA_TIMEOUT_SECONDS: float = 120
+    OLLAMA_INITIAL_CONCURRENCY: int = 4
+    OLLAMA_MIN_CONCURRENCY: int = 1
+    OLLAMA_MAX_CONCURRENCY: int = 16
+    OLLAMA_LATENCY_TOLERANCE: float = 2.0
+
+    # Distilled local classifier, consulted before Ollama
+    LOCAL_CLASSIFIER_ENABLED: bool = True
+    LOCAL_CLASSIFIER_DIR: str = "models"
+    LOCAL_CLASSIFIER_THRESHOLD: float = 0.9
+    LOCAL_CLASSIFIER_RELOAD_SECONDS: int = 300
+
+    # Deterministic header/label rules, applied before any model
+    CLASSIFICATION_RULES_ENABLED: bool = True
+    CLASSIFICATION_RULES_PATH: str = "classification_rules.json"
+
+    # Near-duplicate classification cache (SimHash of the masked body, per sender)
+    CLASSIFICATION_CACHE_ENABLED: bool = True
+    CLASSIFICATION_CACHE_SCOPE: str = "address"
+    CLASSIFICATION_CACHE_MAX_DISTANCE: int = 5
+    CLASSIFICATION_CACHE_MAX_ENTRIES: int = 50000
+    CLASSIFICATION_CACHE_MAX_PER_SENDER: int = 64
+
+    # Redis (locks, caches, and shared counters)
+    REDIS_URL: str = "redis://redis:6379/0"
+
+    # Gmail sync
+    GMAIL_BATCH_SIZE: int = 50
+    GMAIL_BATCH_MAX_RETRIES: int = 5
+    GMAIL_INTERACTIVE_MAX_RETRIES: int = 1
+    GMAIL_FULL_RESYNC_MAX_MESSAGES: int = 500
+    BACKFILL_CHUNK_SIZE: int = 100
+    BACKFILL_PAGES_PER_TASK: int = 20
+    BACKFILL_LOCK_SECONDS: int = 600
+    GMAIL_SERVICE_CACHE_TTL_SECONDS: int = 900
+    INGEST_METADATA_FIRST: bool = True
+    BODY_FETCH_CHUNK_SIZE: int = 50
+    BODY_FETCH_CHAIN_SECONDS: int = 600
+    MAX_BODY_BYTES: int = 1024 * 1024
+
+    # Email body storage
+    BODY_ZSTD_LEVEL: int = 3
+    BODY_ZSTD_DICT_PATH: str = ""
+    BODY_REENCODE_BATCH_SIZE: int = 500
+
+    # Attachment cache
+    ATTACHMENT_CACHE_DIR: str = "/tmp/emailing-attachments"
+    ATTACHMENT_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # OAuth token refresh. The margin must stay above google-auth's own refresh threshold (3m45s)
+    TOKEN_REFRESH_MARGIN_SECONDS: int = 600
+    TOKEN_REFRESH_INTERVAL_SECONDS: int = 300
+    TOKEN_REFRESH_LOCK_SECONDS: int = 30
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
\ No newline at end of file
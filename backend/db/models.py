@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, LargeBinary
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, LargeBinary, UniqueConstraint, JSON, true, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
@@ -12,15 +12,20 @@ class User(Base):
     full_name = Column(String)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     last_synced = Column(DateTime)
+    history_id = Column(String)
+    backfill_page_token = Column(String)
+    backfill_completed_at = Column(DateTime)
     
     google_sub = Column(LargeBinary, unique=True, index=True)
     encrypted_access_token = Column(LargeBinary, unique=True)
     encrypted_refresh_token = Column(LargeBinary, unique=True)
+    token_expires_at = Column(DateTime)
 
     emails = relationship("Email", back_populates="users", cascade="all, delete-orphan")
 
 class Email(Base):
     __tablename__ = 'emails'
+    __table_args__ = (UniqueConstraint('user_id', 'email_id', name='uq_emails_user_id_email_id'),)
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id  = Column(Integer, ForeignKey('users.id'), nullable=False)
     email_id  = Column(String, nullable=False)
@@ -34,8 +39,17 @@ class Email(Base):
     urgency = Column(String)
     is_processed = Column(Boolean, default=False, index=True)
     inference_time = Column(Integer, nullable=True)
+    classified_by = Column(String)
+    needs_resummary = Column(Boolean, default=False, server_default=false(), index=True)
     is_deleted = Column(Boolean, default=False)
     body_text = Column(LargeBinary) 
+    snippet = Column(String)
+    label_ids = Column(JSON)
+    headers = Column(JSON)
+    body_fetched = Column(Boolean, default=True, server_default=true(), index=True)
+    preprocess_key = Column(String(64))
+    masked_text = Column(LargeBinary)
+    pii_map = Column(LargeBinary)
 
     users = relationship("User", back_populates="emails")
     attachments = relationship("Attachment", back_populates="emails", cascade="all, delete-orphan")
@@ -48,5 +62,18 @@ class Attachment(Base):
     filename  = Column(String, nullable=False)
     mime_type = Column(String)
     size = Column(Integer)
+    content_id = Column(String)
+    disposition = Column(String)
+    is_inline = Column(Boolean)
+    content_hash = Column(String(64))
 
-    emails = relationship("Email", back_populates="attachments")
\ No newline at end of file
+    emails = relationship("Email", back_populates="attachments")
+
+class QuarantinedMessage(Base):
+    __tablename__ = 'quarantined_messages'
+    __table_args__ = (UniqueConstraint('user_id', 'email_id', name='uq_quarantined_messages_user_id_email_id'),)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    email_id = Column(String, nullable=False)
+    error = Column(String)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
\ No newline at end of file
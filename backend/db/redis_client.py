@@ -0,0 +1,11 @@
+import redis
+from config import settings
+
+_client = None
+
+# Function that returns the shared Redis connection pool
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
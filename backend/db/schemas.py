@@ -20,6 +20,7 @@ class EmailRead(BaseModel):
     thread_id: str
     sender: Optional[str] = None
     subject: Optional[str] = None
+    snippet: Optional[str] = None
     received_at: Optional[datetime] = None
     category: Optional[str] = None
     summary: Optional[str] = None
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Depends, Request, Response, HTTPException, status
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from authlib.integrations.starlette_client import OAuth
 from starlette.middleware.sessions import SessionMiddleware
@@ -11,8 +11,8 @@ from db.models import User
 from db import schemas
 from authent.token_utils import create_access_token, decode_access_token, get_current_user
 
-from services import user_service, email_service
-from tasks import sync_user_emails
+from services import user_service, email_service, attachment_cache
+from celery_app import celery_app
 from config import settings
 
 # Initialize FastAPI app and middleware
@@ -73,7 +73,8 @@ async def auth(request: Request, db: Session = Depends(get_db)):
         name=user_info.get('name', ''),
         google_sub=user_info.get('sub'),
         access_token=token.get('access_token'),
-        refresh_token=token.get('refresh_token')
+        refresh_token=token.get('refresh_token'),
+        expires_at=token.get('expires_at')
     )
 
     # Create JWT token for session
@@ -120,8 +121,8 @@ async def trigger_sync(current_user: User = Depends(get_current_user)):
     """
     Fetches new emails and generates AI content
     """
-    # Sends Redis task
-    task = sync_user_emails.delay(current_user.id)
+    # Sends Redis task by name, so the API never imports the worker's AI stack
+    task = celery_app.send_task("sync_user_emails", args=[current_user.id])
     return {"message": "Sync started", "task_id": task.id}
 
 @app.get("/emails", response_model=List[schemas.EmailRead])
@@ -131,30 +132,64 @@ def get_emails(db: Session = Depends(get_db), current_user: User = Depends(get_c
     """
     return email_service.get_recent_emails_for_user(db, current_user.id)
 
+# A plain def, so FastAPI runs it in its threadpool: opening an email may wait on Gmail
 @app.get("/emails/{email_id}/body", response_model=schemas.EmailBodyResponse)
-async def get_email_body(email_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_email_body(email_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Retrieves and decrypts the body content of a specific email, along with its attachments
     """
-    return email_service.get_email_details(db, current_user.id, email_id)
+    return email_service.get_email_details(db, current_user, email_id)
 
+# A plain def, so FastAPI runs it in its threadpool: a cache miss waits on Gmail
 @app.get("/emails/{email_id}/attachments/{attachment_id}")
-async def get_attachment_route(email_id: int, attachment_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_attachment_route(email_id: int, attachment_id: int, request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
-    Downloads a specific attachment.
+    Downloads a specific attachment. Supports single HTTP Range requests.
     """
     try:
-        file_data, mime_type, filename = email_service.download_attachment(db, current_user, email_id, attachment_id)
-        
-        # Return as a file stream with the correct headers for downloading
-        return Response(
-            content=file_data, 
-            media_type=mime_type,
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-        )
+        content_hash, size, mime_type, filename = email_service.download_attachment(db, current_user, email_id, attachment_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Accept-Ranges": "bytes"
+    }
+    if size == 0:
+        return Response(content=b"", media_type=mime_type, headers=headers)
+
+    # Serve the requested byte range, or the whole file
+    try:
+        byte_range = attachment_cache.parse_range_header(request.headers.get("range"), size)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    # Open the cached file before any headers go out. If it was evicted since the lookup, fetch it again
+    try:
+        chunks = attachment_cache.open_range(content_hash, start, end)
+    except FileNotFoundError:
+        try:
+            content_hash, _, _, _ = email_service.download_attachment(db, current_user, email_id, attachment_id)
+            chunks = attachment_cache.open_range(content_hash, start, end)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Stream decrypted chunks from the cache so memory use stays bounded regardless of file size
+    return StreamingResponse(
+        chunks,
+        status_code=status_code,
+        media_type=mime_type,
+        headers=headers
+    )
+
 @app.get("/logout")
 async def logout(response: Response):
     """
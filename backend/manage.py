@@ -0,0 +1,178 @@
+"""
+Maintenance commands for the backend
+
+Run from the backend directory:
+    python manage.py train-classifier
+    python manage.py evaluate-classifier --llm-sample 50
+    python manage.py rules-report
+"""
+import argparse
+import statistics
+import time
+from collections import Counter
+
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+from config import settings
+from db.database import Session
+from db.models import Email
+from services import local_classifier, rules
+
+
+def _agreement(predictions: list, rows: list) -> tuple:
+    category = sum(p["category"] == r[4] for p, r in zip(predictions, rows)) / len(rows)
+    urgency = sum(p["urgency"] == str(r[5]) for p, r in zip(predictions, rows)) / len(rows)
+    return category, urgency
+
+
+def train_classifier(args):
+    '''
+    Trains the distilled classifier on the LLM's stored labels and saves a new model version
+    '''
+    db = Session()
+    try:
+        rows = local_classifier.load_labelled_emails(db)
+    finally:
+        db.close()
+
+    train_rows = [r for r in rows if not local_classifier.is_holdout(r[0])]
+    holdout_rows = [r for r in rows if local_classifier.is_holdout(r[0])]
+    if len(train_rows) < args.min_samples:
+        print(f"Only {len(train_rows)} labelled emails, need {args.min_samples}. Nothing trained.")
+        return
+
+    start = time.perf_counter()
+    model = local_classifier.LocalClassifier.train([r[1:] for r in train_rows], dim=2 ** args.bits, epochs=args.epochs)
+    print(f"Trained on {len(train_rows)} emails in {time.perf_counter() - start:.1f}s")
+
+    if holdout_rows:
+        predictions = [model.predict(r[1], r[2], r[3]) for r in holdout_rows]
+        category, urgency = _agreement(predictions, holdout_rows)
+        model.metadata["holdout"] = {"samples": len(holdout_rows), "category_agreement": category, "urgency_agreement": urgency}
+        print(f"Holdout agreement on {len(holdout_rows)} emails: category {category:.1%}, urgency {urgency:.1%}")
+
+    print(f"Saved {model.save(args.output or settings.LOCAL_CLASSIFIER_DIR)}")
+
+
+def evaluate_classifier(args):
+    '''
+    Compares the newest model with the LLM labels of held-out emails, by confidence threshold
+    '''
+    path = args.model or local_classifier.latest_model_path(settings.LOCAL_CLASSIFIER_DIR)
+    if not path:
+        print("No trained model found.")
+        return
+    model = local_classifier.LocalClassifier.load(path)
+
+    db = Session()
+    try:
+        rows = [r for r in local_classifier.load_labelled_emails(db) if local_classifier.is_holdout(r[0])]
+    finally:
+        db.close()
+    if not rows:
+        print("No held-out labelled emails to evaluate on.")
+        return
+
+    predictions = []
+    latencies = []
+    for r in rows:
+        start = time.perf_counter()
+        predictions.append(model.predict(r[1], r[2], r[3]))
+        latencies.append((time.perf_counter() - start) * 1e6)
+
+    print(f"Model {path} ({model.metadata['samples']} training emails, trained {model.metadata['trained_at']})")
+    print(f"Held-out emails: {len(rows)}")
+    print(f"Local latency: p50 {statistics.median(latencies):.0f} us, max {max(latencies):.0f} us")
+    print(f"{'threshold':>9} {'coverage':>9} {'category':>9} {'urgency':>8}")
+    for threshold in sorted({0.0, 0.5, 0.7, 0.8, 0.9, 0.95, settings.LOCAL_CLASSIFIER_THRESHOLD}):
+        covered = [(p, r) for p, r in zip(predictions, rows) if p["confidence"] >= threshold]
+        if not covered:
+            print(f"{threshold:>9.2f} {0:>9.1%} {'-':>9} {'-':>8}")
+            continue
+        category, urgency = _agreement(*zip(*covered))
+        print(f"{threshold:>9.2f} {len(covered) / len(rows):>9.1%} {category:>9.1%} {urgency:>8.1%}")
+
+    # Re-running the LLM on a sample gives its latency and how often it agrees with its own stored labels
+    if args.llm_sample:
+        from services.ai_service import get_classification_ollama
+
+        sample = rows[:args.llm_sample]
+        llm_predictions = []
+        llm_latencies = []
+        for r in sample:
+            start = time.perf_counter()
+            result = get_classification_ollama(r[3])
+            llm_latencies.append((time.perf_counter() - start) * 1e6)
+            llm_predictions.append({"category": result.get("category"), "urgency": str(result.get("urgency"))})
+        category, urgency = _agreement(llm_predictions, sample)
+        print(f"LLM latency: p50 {statistics.median(llm_latencies):.0f} us over {len(sample)} emails "
+              f"({statistics.median(llm_latencies) / statistics.median(latencies):.0f}x local)")
+        print(f"LLM self-agreement: category {category:.1%}, urgency {urgency:.1%}")
+
+
+def rules_report(args):
+    '''
+    Shows how much of the queue the rules stage settles without a model, and which stage labelled processed emails
+    '''
+    db = Session()
+    try:
+        query = db.query(Email).options(load_only(Email.id, Email.sender, Email.subject, Email.label_ids, Email.headers))\
+            .filter(Email.is_deleted == False)
+        if not args.all:
+            query = query.filter(Email.is_processed == False)
+        matched = Counter()
+        total = 0
+        for record in query.yield_per(1000):
+            total += 1
+            result = rules.classify(record)
+            matched[result[0] if result else None] += 1
+
+        stages = Counter(dict(
+            db.query(Email.classified_by, func.count(Email.id)).filter(Email.is_processed == True).group_by(Email.classified_by).all()
+        ))
+    finally:
+        db.close()
+
+    scope = "all emails" if args.all else "unprocessed queue"
+    print(f"Rules from {settings.CLASSIFICATION_RULES_PATH} over the {scope}: {total} emails")
+    if total:
+        bypassed = total - matched[None]
+        print(f"Bypass the models: {bypassed} ({bypassed / total:.1%})")
+        for name, count in matched.most_common():
+            if name is not None:
+                print(f"  {name:<30} {count:>7} ({count / total:.1%})")
+
+    processed = sum(stages.values())
+    if processed:
+        print(f"Processed emails by classification stage: {processed}")
+        for stage, count in stages.most_common():
+            print(f"  {stage or 'llm (before tracking)':<30} {count:>7} ({count / processed:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train-classifier", help="train a new local classifier version")
+    train.add_argument("--output", help="model directory (default: LOCAL_CLASSIFIER_DIR)")
+    train.add_argument("--bits", type=int, default=18, help="log2 of the hashed feature space")
+    train.add_argument("--epochs", type=int, default=60)
+    train.add_argument("--min-samples", type=int, default=200)
+    train.set_defaults(handler=train_classifier)
+
+    evaluate = commands.add_parser("evaluate-classifier", help="report agreement with the LLM on held-out emails")
+    evaluate.add_argument("--model", help="model file (default: newest in LOCAL_CLASSIFIER_DIR)")
+    evaluate.add_argument("--llm-sample", type=int, default=0, help="re-run Ollama on this many emails to compare latency")
+    evaluate.set_defaults(handler=evaluate_classifier)
+
+    report = commands.add_parser("rules-report", help="report how many emails the rules stage classifies")
+    report.add_argument("--all", action="store_true", help="cover every email, not just the unprocessed queue")
+    report.set_defaults(handler=rules_report)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
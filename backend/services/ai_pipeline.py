@@ -0,0 +1,113 @@
+import logging
+from collections import namedtuple
+from db.database import Session
+from db.models import User, Email
+from config import settings
+from services.email_service import fetch_email_bodies
+from services.ai_service import preprocess_batch, classify_batch, summarize_batch, combine_results
+from services.pipeline import Pipeline
+
+# Plain copy of the fields the model stages read, so ORM objects never cross between stage threads
+EmailSnapshot = namedtuple("EmailSnapshot", ["id", "sender", "subject", "label_ids", "headers"])
+
+def run_ai_pipeline(user_id: int, batch_size: int, max_batches: int) -> dict:
+    """
+    Processes the user's unprocessed emails as a stream of batches: preprocess -> classify -> summarize -> persist.
+    Batch N+1 is preprocessed and classified while batch N waits on Gemini.
+    Returns the pipeline report, with "more" set when emails were left for another run
+    and "postponed" set when the Gemini quota ran out before every email was summarized
+    """
+    # Sessions are not thread-safe, so every stage that touches the database gets its own
+    source_db, preprocess_db, persist_db = Session(), Session(), Session()
+    state = {"more": False, "postponed": False, "emails": 0}
+
+    def source():
+        last_id = 0
+        for _ in range(max_batches):
+            # Once the quota is out, the remaining emails wait for the task's retry
+            if state["postponed"]:
+                return
+            ids = [row.id for row in source_db.query(Email.id).filter(
+                Email.user_id == user_id,
+                Email.is_processed == False,
+                Email.id > last_id,
+            ).order_by(Email.id).limit(batch_size)]
+            if not ids:
+                return
+            last_id = ids[-1]
+            yield ids
+        state["more"] = True
+
+    def preprocess(ids):
+        records = preprocess_db.query(Email).filter(Email.id.in_(ids)).order_by(Email.id).all()
+
+        # The AI pipeline needs the full body, so fetch any that are still metadata-only.
+        # Emails whose body still isn't there are left unprocessed for a later run
+        if any(not r.body_fetched for r in records):
+            user = preprocess_db.query(User).filter(User.id == user_id).first()
+            fetch_email_bodies(preprocess_db, user, records)
+            records = [r for r in records if r.body_fetched]
+
+        # Commit the masked text before calling the models, so a retry starts from the cache
+        prepared = preprocess_batch(records)
+        snapshots = [EmailSnapshot(r.id, r.sender, r.subject, r.label_ids, r.headers) for r in records]
+        preprocess_db.commit()
+        return snapshots, prepared
+
+    def classify(batch):
+        snapshots, prepared = batch
+        return snapshots, prepared, classify_batch(snapshots, prepared)
+
+    def summarize(batch):
+        snapshots, prepared, classifications = batch
+        summaries = {} if state["postponed"] else summarize_batch(snapshots, prepared)
+        if len(summaries) < len(snapshots):
+            state["postponed"] = True
+        return snapshots, classifications, summaries
+
+    def persist(batch):
+        mappings = []
+        for res in combine_results(*batch):
+            mapping = {
+                "id": res["id"],
+                "category": res["category"],
+                "urgency": str(res["urgency"]),
+                "classified_by": res["classified_by"],
+            }
+            # Emails whose summary was postponed keep their classification but stay unprocessed for the retry
+            if res["summary"] is not None:
+                mapping.update({
+                    "summary": res["summary"],
+                    "inference_time": res["inference_time"],
+                    "needs_resummary": res["needs_resummary"],
+                    "is_processed": True,
+                })
+                state["emails"] += 1
+            mappings.append(mapping)
+        persist_db.bulk_update_mappings(Email, mappings)
+        persist_db.commit()
+
+    pipeline = Pipeline(
+        [("preprocess", preprocess), ("classify", classify), ("summarize", summarize), ("persist", persist)],
+        queue_size=settings.AI_PIPELINE_QUEUE_SIZE,
+    )
+    try:
+        pipeline.run(source())
+    except Exception:
+        preprocess_db.rollback()
+        persist_db.rollback()
+        raise
+    finally:
+        report = {
+            "emails": state["emails"],
+            "seconds": round(pipeline.wall_seconds, 2),
+            "emails_per_second": round(state["emails"] / pipeline.wall_seconds, 2) if pipeline.wall_seconds else 0.0,
+            "stages": pipeline.report(),
+        }
+        logging.info(f"AI pipeline for user {user_id}: {report}")
+        for db in (source_db, preprocess_db, persist_db):
+            db.close()
+
+    report["more"] = state["more"]
+    report["postponed"] = state["postponed"]
+    return report
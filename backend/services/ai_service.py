@@ -1,179 +1,436 @@
+import hashlib
 import logging
 import time
 import re
 import json
-import requests
-import concurrent.futures
-from google import genai
-from google.genai import types
-from authent.encryption import decrypt_token
+from authent.encryption import decrypt_body, encrypt_body
 from config import settings
-from services.privacy import mask_content, deanonymize_text
-from bs4 import BeautifulSoup
+from services.privacy import mask_batch, deanonymize_text, masking_fingerprint, get_masking_stats
+from services.html_text import extract_text_parts
+from services import ollama_client, local_classifier, classification_cache, rules
+from services.tokens import estimate_tokens, truncate_to_tokens
+from services.reduction import reduce_text, reduction_stats, get_reduction_stats
+from services.rate_limiter import gemini_limiter, RateLimited
+from services.circuit_breaker import CircuitBreaker
+from services import extractive
 from prompts import LLAMA_CLASSIFICATION_PROMPT, GEMINI_SUMMARIZATION_PROMPT
 
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+# The Gemini SDK is imported and its client built on first use, keeping it out of processes that never summarize
+_gemini_client = None
 
-OLLAMA_URL = "http://ollama:11434/api/generate" 
+def get_gemini_client():
+    """
+    Returns the shared Gemini client
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        from google import genai
+        _gemini_client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    return _gemini_client
+
+# Stand-in texts for empty or unreadable bodies, which say nothing about their sender's other emails
+UNCACHEABLE_CONTENT = ("No content.", "[Content Error]")
 
-def prepare_email_for_ai(email_record):
+# Bump when the cleaning steps below change, so cached masked text is rebuilt
+PREPROCESS_VERSION = "4"
+
+def _preprocess_key(raw_body: str) -> str:
     """
-    Decrypts the email body, strips HTML, masks PII, and prepares it for AI processing
+    Hashes the body together with the preprocessing version and every setting that changes the prepared text
     """
-    try:
-        if not email_record.body_text:
-            return "No content.", {}
-            
-        raw_body = decrypt_token(email_record.body_text)
-        
-        # Remove all HTML/CSS
-        soup = BeautifulSoup(raw_body, "html.parser")
-        clean_text = soup.get_text(separator=" ", strip=True)
-        
-        masked_body, pii_map = mask_content(clean_text)
+    prefix = (
+        f"{PREPROCESS_VERSION}:{masking_fingerprint()}:{settings.CONTENT_REDUCTION_ENABLED}:"
+        f"{settings.AI_TEXT_MAX_TOKENS}:{settings.AI_EXTRACT_MAX_CHARS}:"
+    ).encode()
+    return hashlib.sha256(prefix + raw_body.encode()).hexdigest()
+
+def _load_email_text(email_record):
+    """
+    Decrypts the body and looks up the preprocessing cache.
+    Returns (prepared, key, clean_text): prepared is (masked_text, pii_map) when nothing is left to do,
+    otherwise clean_text is the visible text that still needs masking
+    """
+    if not email_record.body_text:
+        return ("No content.", {}), None, None
         
-        return masked_body[:1500].strip(), pii_map
-    except Exception as e:
-        print(f"Preparation Error: {e}")
-        return "[Content Error]", {}
+    raw_body = decrypt_body(email_record.body_text)
 
-def get_classification_ollama(email_text):
+    # Reuse the cached text when neither the body nor the preprocessing changed
+    key = _preprocess_key(raw_body)
+    if email_record.preprocess_key == key and email_record.masked_text is not None:
+        pii_map = json.loads(decrypt_body(email_record.pii_map)) if email_record.pii_map else {}
+        return (decrypt_body(email_record.masked_text), pii_map), key, None
+    
+    # Remove all HTML/CSS in one parse that also separates out quoted containers. The window is wider
+    # than the prompt budget, since reduction and masking change the length before the text is cut to tokens
+    clean_text, unquoted_text = extract_text_parts(raw_body, max_chars=settings.AI_EXTRACT_MAX_CHARS)
+    if not settings.CONTENT_REDUCTION_ENABLED:
+        return None, key, clean_text
+
+    # Drop quoted replies, signatures and footers, but keep the full text when nothing novel is left
+    reduced = reduce_text(unquoted_text)
+    if len(reduced.strip()) < 20:
+        reduced = reduce_text(clean_text) or clean_text
+
+    # Savings are counted on what would reach the prompt, since both sides get cut to the same budget
+    saved = reduction_stats.record(
+        truncate_to_tokens(clean_text, settings.AI_TEXT_MAX_TOKENS),
+        truncate_to_tokens(reduced, settings.AI_TEXT_MAX_TOKENS),
+    )
+    logging.info(f"Content reduction saved {saved} prompt tokens on email {email_record.id}")
+    return None, key, reduced
+
+def _finish_masking(masked_body: str, pii_map: dict, key: str):
     """
-    Classification LLM: Local Llama handles classification and urgency scoring
+    Trims masked text to the prompt budget and builds its cache entry
+    """
+    masked_body = truncate_to_tokens(masked_body, settings.AI_TEXT_MAX_TOKENS).strip()
+    return masked_body, pii_map, {"preprocess_key": key, "masked_text": masked_body, "pii_map": pii_map}
+
+def store_preprocessed(email_record, cache_entry: dict):
     """
-    prompt = LLAMA_CLASSIFICATION_PROMPT.format(email_text=email_text[:1500])
+    Saves masked text and the encrypted PII map on the email so retries skip preprocessing
+    """
+    email_record.preprocess_key = cache_entry["preprocess_key"]
+    email_record.masked_text = encrypt_body(cache_entry["masked_text"])
+    email_record.pii_map = encrypt_body(json.dumps(cache_entry["pii_map"]))
+
+def preprocess_batch(email_records: list) -> dict:
+    """
+    Prepares every email, masking all cache misses together in one batched spaCy pass.
+    Newly computed results are stored on the records. Returns a dict of email ID -> (masked_text, pii_map)
+    """
+    prepared = {}
+    pending = []
+    for record in email_records:
+        try:
+            cached, key, clean_text = _load_email_text(record)
+        except Exception as e:
+            print(f"Preparation Error: {e}")
+            prepared[record.id] = ("[Content Error]", {})
+            continue
+
+        if cached:
+            prepared[record.id] = cached
+        else:
+            pending.append((record, key, clean_text))
+
+    if not pending:
+        return prepared
+
     try:
-        response = requests.post(OLLAMA_URL, json={
-            "model": "llama3.2",
-            "prompt": prompt,
-            "stream": False,
-            "format": "json",
-            "keep_alive": "1h"
-        }, timeout=120)
+        masked = mask_batch([clean_text for _, _, clean_text in pending])
+    except Exception as e:
+        print(f"Preparation Error: {e}")
+        prepared.update({record.id: ("[Content Error]", {}) for record, _, _ in pending})
+        return prepared
+
+    for (record, key, _), (masked_body, pii_map) in zip(pending, masked):
+        content, pii_map, cache_entry = _finish_masking(masked_body, pii_map, key)
+        prepared[record.id] = (content, pii_map)
+        store_preprocessed(record, cache_entry)
+
+    logging.info(f"Masking stats: {get_masking_stats()}")
+    logging.info(f"Content reduction: {get_reduction_stats()}")
+    return prepared
 
-        raw_response = response.json()['response']
+def _ollama_prompt(email_text: str) -> str:
+    return LLAMA_CLASSIFICATION_PROMPT.format(email_text=truncate_to_tokens(email_text, settings.AI_TEXT_MAX_TOKENS))
 
-        # Extract JSON from the response
+def _parse_classification(raw_response: str) -> dict:
+    """
+    Extracts the JSON object from the model's reply
+    """
+    try:
         json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
         if json_match:
             return json.loads(json_match.group())
         return json.loads(raw_response)
-    
-    # Catch JSON parsing errors and any other exceptions to prevent the whole batch from failing
-    except (json.JSONDecodeError, Exception) as e:
+    except json.JSONDecodeError:
         logging.error(f"Failed to parse LLM output: {raw_response}")
         return {"category": "Uncategorized", "urgency": "1"}
 
-def classify_and_summarize_batch(email_records: list, max_workers: int = 5) -> list:
+def get_classification_ollama(email_text):
     """
-    Summarization LLM: Combines Ollama's classification with Gemini's summaries
+    Classification LLM: Local Llama handles classification and urgency scoring
     """
-    if not email_records:
-        return []
+    result, _ = ollama_client.generate_many([_ollama_prompt(email_text)], _parse_classification)[0]
+    if isinstance(result, Exception):
+        logging.error(f"Ollama request failed: {result}")
+        return {"category": "Uncategorized", "urgency": "1"}
+    return result
 
-    email_blocks = []
-    pii_vault = {} 
+def classify_batch(email_records: list, prepared: dict) -> dict:
+    """
+    Classification: rules, then the near-duplicate cache, then the local classifier, then Ollama.
+    Returns a dict of email ID -> {"category", "urgency", "classified_by", "time_ms"}
+    """
     ollama_results = {}
     ollama_times = {}
+    classified_by = {}
 
-    # Helper function to process each email with Ollama in parallel
-    def parallel_process_classification(e):
-        content, pii_map = prepare_email_for_ai(e)
-        start_ollama = time.time()
-        class_data = get_classification_ollama(content)
-        end_ollama = time.time()
-        
-        return {
-            "id": e.id, 
-            "pii_map": pii_map, 
-            "class_data": class_data, 
-            "content": content, 
-            "time": (end_ollama - start_ollama) * 1000,
-            "sender": e.sender, 
-            "subject": e.subject
+    # Gmail labels and list headers settle bulk mail deterministically, before any model
+    if settings.CLASSIFICATION_RULES_ENABLED:
+        for e in email_records:
+            matched = rules.classify(e)
+            if matched:
+                ollama_results[e.id] = matched[1]
+                ollama_times[e.id] = 0
+                classified_by[e.id] = "rules"
+
+    # Near-duplicates of emails the LLM already classified reuse its labels
+    if settings.CLASSIFICATION_CACHE_ENABLED:
+        try:
+            start_cache = time.perf_counter()
+            lookups = [
+                (e.id, e.sender, prepared[e.id][0]) for e in email_records
+                if e.id not in ollama_results and prepared[e.id][0] not in UNCACHEABLE_CONTENT
+            ]
+            cached = classification_cache.lookup_batch(lookups)
+            cache_ms = (time.perf_counter() - start_cache) * 1000 / max(1, len(lookups))
+            for email_id, class_data in cached.items():
+                ollama_results[email_id] = class_data
+                ollama_times[email_id] = cache_ms
+                classified_by[email_id] = "cache"
+            logging.info(f"Classification cache: {classification_cache.get_stats()}")
+        except Exception as exc:
+            print(f"Classification cache error: {exc}")
+
+    # The distilled classifier answers confident cases in microseconds, the rest go to Ollama
+    local_model = local_classifier.get_model() if settings.LOCAL_CLASSIFIER_ENABLED else None
+    if local_model:
+        for e in email_records:
+            if e.id in ollama_results:
+                continue
+            start_local = time.perf_counter()
+            prediction = local_model.predict(e.sender, e.subject, prepared[e.id][0])
+            if prediction["confidence"] >= settings.LOCAL_CLASSIFIER_THRESHOLD:
+                ollama_results[e.id] = prediction
+                ollama_times[e.id] = (time.perf_counter() - start_local) * 1000
+                classified_by[e.id] = "local"
+
+    # Classify the remaining emails concurrently on the shared async client; its adaptive limit decides how many run at once
+    escalated = [e for e in email_records if e.id not in ollama_results]
+    if local_model:
+        logging.info(f"Local classifier handled {len(email_records) - len(escalated)}/{len(email_records)} emails")
+    classifications = ollama_client.generate_many(
+        [_ollama_prompt(prepared[e.id][0]) for e in escalated], _parse_classification
+    )
+
+    for e, (class_data, elapsed_ms) in zip(escalated, classifications):
+        # A failed request only loses its own classification, the email is still summarized
+        if isinstance(class_data, Exception):
+            print(f"Ollama request failed: {class_data}")
+            class_data = {"category": "Uncategorized", "urgency": "1"}
+
+        ollama_results[e.id] = class_data
+        ollama_times[e.id] = elapsed_ms
+        classified_by[e.id] = "llm"
+
+    # Remember successful LLM labels for later near-duplicates
+    if settings.CLASSIFICATION_CACHE_ENABLED:
+        try:
+            classification_cache.store_batch([
+                (e.sender, prepared[e.id][0], ollama_results[e.id].get("category"), ollama_results[e.id].get("urgency", "1"))
+                for e in escalated
+                if ollama_results[e.id].get("category") not in local_classifier.UNTRAINABLE_CATEGORIES
+                and prepared[e.id][0] not in UNCACHEABLE_CONTENT
+            ])
+        except Exception as exc:
+            print(f"Classification cache error: {exc}")
+
+    return {
+        email_id: {
+            "category": class_data.get("category", "Uncategorized"),
+            "urgency": str(class_data.get("urgency", "1")),
+            "classified_by": classified_by.get(email_id),
+            "time_ms": ollama_times.get(email_id, 0),
         }
+        for email_id, class_data in ollama_results.items()
+    }
+
+# Define safety settings to prevent harmful content generation
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_ONLY_HIGH"},
+]
+
+class GeminiQuotaExceeded(Exception):
+    """
+    Gemini answered 429. summarize_batch stops sending and leaves the rest of the batch for the task's retry
+    """
+
+# Trips after repeated Gemini failures or slow calls; while open, emails get a local extractive summary instead
+gemini_breaker = CircuitBreaker("gemini", settings.GEMINI_BREAKER_FAILURES, settings.GEMINI_BREAKER_COOLDOWN_SECONDS)
+
+# Tokens the prompt template itself adds to every request
+PROMPT_OVERHEAD_TOKENS = estimate_tokens(GEMINI_SUMMARIZATION_PROMPT)
+
+def _email_block(email_record, content: str) -> str:
+    return f"ID: {email_record.id}\nSender: {email_record.sender}\nSubject: {email_record.subject}\nContent: {content}\n---"
+
+def pack_batches(blocks: dict, token_budget: int, max_emails: int) -> list:
+    """
+    Greedily groups email IDs, in order, so each request's estimated prompt stays within token_budget.
+    An email larger than the budget on its own still gets a request to itself
+    """
+    batches = []
+    current, current_tokens = [], PROMPT_OVERHEAD_TOKENS
+    for email_id, block in blocks.items():
+        tokens = estimate_tokens(block)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_emails):
+            batches.append(current)
+            current, current_tokens = [], PROMPT_OVERHEAD_TOKENS
+        current.append(email_id)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _request_summaries(blocks: dict, email_ids: list):
+    """
+    Sends one Gemini request for the given emails. Returns (valid summaries by ID, elapsed ms, whether the call succeeded).
+    IDs that come back missing, duplicated or without a summary are left out for the caller to resubmit
+    """
+    from google.genai import errors, types
 
-    # Process emails in parallel to get classifications and prepare for summarization
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(parallel_process_classification, e) for e in email_records]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                res = future.result()
-                
-                # Repopulate dictionaries
-                pii_vault[res["id"]] = res["pii_map"]
-                ollama_results[res["id"]] = res["class_data"]
-                ollama_times[res["id"]] = res["time"]
-                
-                email_blocks.append(
-                    f"ID: {res['id']}\nSender: {res['sender']}\nSubject: {res['subject']}\nContent: {res['content']}\n---"
-                )
-            
-            # Catch exceptions from individual email processing to ensure one failure doesn't affect the whole batch
-            except Exception as exc:
-                print(f"Ollama thread failed: {exc}")
-
-    # Generate summary using Gemini
     prompt = GEMINI_SUMMARIZATION_PROMPT.format(
-        num_emails=len(email_records), 
-        email_blocks=chr(10).join(email_blocks)
+        num_emails=len(email_ids),
+        email_blocks=chr(10).join(blocks[email_id] for email_id in email_ids)
     )
 
-    # Define safety settings to prevent harmful content generation
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_ONLY_HIGH"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_ONLY_HIGH"},
-    ]
+    # Reserve shared RPM/TPM quota first. Waits longer than GEMINI_MAX_WAIT_SECONDS raise RateLimited
+    reserved_tokens = estimate_tokens(prompt) + settings.GEMINI_OUTPUT_TOKENS_PER_EMAIL * len(email_ids)
+    wait = gemini_limiter.reserve(reserved_tokens, settings.GEMINI_MAX_WAIT_SECONDS)
+    if wait:
+        time.sleep(wait)
 
+    start_gemini = time.time()
     try:
-        start_gemini = time.time()
-
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
+        response = get_gemini_client().models.generate_content(
+            model=settings.GEMINI_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type='application/json',
-                safety_settings=safety_settings
+                safety_settings=SAFETY_SETTINGS
             )
         )
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.total_token_count:
+            gemini_limiter.adjust(usage.total_token_count - reserved_tokens)
+        gemini_results = json.loads(response.text)
 
-        end_gemini = time.time()
-        gemini_total_ms = (end_gemini - start_gemini) * 1000
-        gemini_ms_per_email = gemini_total_ms / len(email_records)
+    except json.JSONDecodeError as exception:
+        print(f"Batch AI Error: {exception}")
+        return {}, (time.time() - start_gemini) * 1000, True
 
-        gemini_results = json.loads(response.text)
-        
-        final_results = []
-        
-        # Combine classification and summary, and deanonymize if needed
-        for res in gemini_results:
-            try:
-                email_id = int(res.get("id"))
-            except (TypeError, ValueError):
-                print(f"AI returned invalid ID format: {res.get('id')}")
-                continue
-            
-            if email_id in pii_vault:
-                res["summary"] = deanonymize_text(res["summary"], pii_vault[email_id])
-            
-            classification_data = ollama_results.get(email_id, {})
-
-            local_ms = ollama_times.get(email_id, 0)
-            total_ms = round(local_ms + gemini_ms_per_email)
-
-
-            final_results.append({
-                "id": email_id,
-                "category": classification_data.get("category", "Uncategorized"),
-                "urgency": str(classification_data.get("urgency", "1")),
-                "summary": res["summary"],
-                "inference_time": total_ms
-            })
-            
-        return final_results
-    
+    # Quota errors stop summarize_batch, which leaves the unsent emails for a retry
+    except errors.APIError as exception:
+        if exception.code == 429:
+            raise GeminiQuotaExceeded(str(exception)) from exception
+        print(f"Batch AI Error: {exception}")
+        return {}, (time.time() - start_gemini) * 1000, False
     except Exception as exception:
         print(f"Batch AI Error: {exception}")
-        return [{"id": record.id, "summary": "Error: Batch processing failed.", "category": "Error"} for record in email_records]
\ No newline at end of file
+        return {}, (time.time() - start_gemini) * 1000, False
+    elapsed_ms = (time.time() - start_gemini) * 1000
+
+    summaries = {}
+    requested = set(email_ids)
+    for res in gemini_results if isinstance(gemini_results, list) else []:
+        if not isinstance(res, dict):
+            continue
+        try:
+            email_id = int(res.get("id"))
+        except (TypeError, ValueError):
+            print(f"AI returned invalid ID format: {res.get('id')}")
+            continue
+        summary = res.get("summary")
+        if email_id in requested and email_id not in summaries and isinstance(summary, str) and summary.strip():
+            summaries[email_id] = summary
+    return summaries, elapsed_ms, True
+
+def _extractive_summary(content: str, pii_map: dict) -> str:
+    return deanonymize_text(extractive.summarize(content), pii_map)
+
+def summarize_batch(email_records: list, prepared: dict) -> dict:
+    """
+    Summarization LLM: Gemini summarizes the masked emails in token-budgeted requests.
+    Emails missing from a response are resubmitted in smaller requests, up to GEMINI_MAX_RESUBMITS times.
+    Emails Gemini cannot summarize, or that arrive while the circuit breaker is open, get a local extractive summary.
+    When the Gemini quota runs out, it stops sending and leaves the unsent emails out of the result for a retry.
+    Returns a dict of email ID -> (deanonymized summary, summarization ms per email, whether it is the local fallback)
+    """
+    blocks = {e.id: _email_block(e, prepared[e.id][0]) for e in email_records}
+    results = {}
+    pending = list(blocks)
+    token_budget = settings.GEMINI_BATCH_TOKEN_BUDGET
+    max_emails = settings.GEMINI_BATCH_MAX_EMAILS
+    postponed = False
+
+    for attempt in range(settings.GEMINI_MAX_RESUBMITS + 1):
+        for email_ids in pack_batches({email_id: blocks[email_id] for email_id in pending}, token_budget, max_emails):
+            if not gemini_breaker.allow():
+                break
+            try:
+                summaries, elapsed_ms, ok = _request_summaries(blocks, email_ids)
+            except GeminiQuotaExceeded:
+                # Gemini's 429s postpone the rest of the batch, unless they just tripped the breaker
+                gemini_breaker.record_failure()
+                postponed = gemini_breaker.state() == "closed"
+                break
+            except RateLimited:
+                # Our own limiter says nothing about Gemini's health, so the breaker is left alone
+                postponed = True
+                break
+
+            if ok and elapsed_ms <= settings.GEMINI_SLOW_CALL_SECONDS * 1000:
+                gemini_breaker.record_success()
+            else:
+                gemini_breaker.record_failure()
+            for email_id, summary in summaries.items():
+                results[email_id] = (deanonymize_text(summary, prepared[email_id][1]), elapsed_ms / len(email_ids), False)
+
+        pending = [email_id for email_id in pending if email_id not in results]
+        if postponed:
+            print(f"Gemini quota exhausted, {len(pending)} emails postponed")
+            return results
+        if not pending or gemini_breaker.state() != "closed":
+            break
+
+        # Follow-up requests are smaller, so one problematic email affects fewer others
+        print(f"Resubmitting {len(pending)} emails missing from Gemini's response")
+        token_budget = max(PROMPT_OVERHEAD_TOKENS, token_budget // 2)
+        max_emails = max(1, max_emails // 2)
+
+    # Anything still pending gets an immediate local summary and is flagged for re-summarization
+    if pending:
+        logging.info(f"Local extractive summaries for {len(pending)} emails (Gemini breaker {gemini_breaker.state()})")
+    for email_id in pending:
+        start_local = time.perf_counter()
+        summary = _extractive_summary(*prepared[email_id])
+        results[email_id] = (summary, (time.perf_counter() - start_local) * 1000, True)
+
+    return results
+
+def combine_results(email_records: list, classifications: dict, summaries: dict) -> list:
+    """
+    Merges classify_batch and summarize_batch output into one result per email.
+    Emails whose summary was postponed get a None summary
+    """
+    final_results = []
+    for e in email_records:
+        classification_data = classifications.get(e.id, {})
+        summary, gemini_ms, fallback = summaries.get(e.id, (None, 0, False))
+        final_results.append({
+            "id": e.id,
+            "category": classification_data.get("category", "Uncategorized"),
+            "urgency": classification_data.get("urgency", "1"),
+            "summary": summary,
+            "inference_time": round(classification_data.get("time_ms", 0) + gemini_ms),
+            "classified_by": classification_data.get("classified_by"),
+            "needs_resummary": fallback
+        })
+    return final_results
@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import os
+import re
+import struct
+import tempfile
+from authent.encryption import derive_aead_key
+from config import settings
+
+# Cache file layout: MAGIC | 8-byte nonce prefix | 8-byte plaintext size, followed by
+# fixed-size AES-GCM chunks so any byte range can be decrypted without reading the whole file
+CACHE_MAGIC = b"AC1"
+NONCE_PREFIX_SIZE = 8
+HEADER_SIZE = len(CACHE_MAGIC) + NONCE_PREFIX_SIZE + 8
+TAG_SIZE = 16
+
+# Plaintext bytes per chunk. A multiple of 3 so each chunk maps to a whole run of base64 characters
+CHUNK_SIZE = 48 * 1024
+B64_CHUNK_CHARS = CHUNK_SIZE // 3 * 4
+
+# Files still being written. They sit next to the shard directories and are never evicted
+TEMP_PREFIX = ".tmp-"
+
+_cache_key = derive_aead_key(b"email.ing attachment cache v1")
+
+def _path_for(content_hash: str) -> str:
+    """
+    Returns the cache path for a content hash, sharded by its first two characters
+    """
+    return os.path.join(settings.ATTACHMENT_CACHE_DIR, content_hash[:2], content_hash)
+
+def _chunk_nonce(nonce_prefix: bytes, index: int) -> bytes:
+    return nonce_prefix + struct.pack(">I", index)
+
+def _chunk_aad(index: int, is_last: bool) -> bytes:
+    # Binding the index and last-chunk flag stops chunks being reordered or the file being truncated
+    return struct.pack(">I?", index, is_last)
+
+def contains(content_hash: str) -> bool:
+    """
+    Checks whether an attachment is cached
+    """
+    return bool(content_hash) and os.path.exists(_path_for(content_hash))
+
+def base64_decode(data: str) -> bytes:
+    """
+    Decodes unpadded base64url data
+    """
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def store(b64_data: str):
+    """
+    Decodes base64url attachment data chunk by chunk into an encrypted cache file, so only one chunk
+    of plaintext exists at a time on top of the encoded input. Returns (content_hash, size).
+    Identical content is only stored once.
+    """
+    os.makedirs(settings.ATTACHMENT_CACHE_DIR, exist_ok=True)
+    nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+    digest = hashlib.sha256()
+
+    # Gmail omits base64 padding, so the size is computed from the unpadded length
+    stripped = b64_data.rstrip("=")
+    size = len(stripped) * 3 // 4
+    chunk_count = max(1, -(-size // CHUNK_SIZE))
+
+    fd, temp_path = tempfile.mkstemp(dir=settings.ATTACHMENT_CACHE_DIR, prefix=TEMP_PREFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(CACHE_MAGIC + nonce_prefix + struct.pack(">Q", size))
+
+            # Decode and encrypt one chunk at a time so only a single chunk of plaintext is in memory
+            for index in range(chunk_count):
+                piece = stripped[index * B64_CHUNK_CHARS:(index + 1) * B64_CHUNK_CHARS]
+                chunk = base64_decode(piece)
+                digest.update(chunk)
+                f.write(_cache_key.encrypt(_chunk_nonce(nonce_prefix, index), chunk, _chunk_aad(index, index == chunk_count - 1)))
+
+        content_hash = digest.hexdigest()
+        path = _path_for(content_hash)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    evict()
+    return content_hash, size
+
+def open_range(content_hash: str, start: int, end: int):
+    """
+    Opens a cached attachment and returns an iterator over its decrypted bytes start..end (inclusive), one chunk at a time.
+    Raises FileNotFoundError if it is not cached, before anything has been sent
+    """
+    path = _path_for(content_hash)
+
+    # Opening the file here keeps it readable even if eviction removes it mid-stream
+    f = open(path, "rb")
+    os.utime(path)
+    return _iter_chunks(f, start, end)
+
+def _iter_chunks(f, start: int, end: int):
+    with f:
+        header = f.read(HEADER_SIZE)
+        nonce_prefix = header[len(CACHE_MAGIC):len(CACHE_MAGIC) + NONCE_PREFIX_SIZE]
+        size = struct.unpack(">Q", header[-8:])[0]
+        chunk_count = max(1, -(-size // CHUNK_SIZE))
+
+        first, last = start // CHUNK_SIZE, end // CHUNK_SIZE
+        f.seek(HEADER_SIZE + first * (CHUNK_SIZE + TAG_SIZE))
+        for index in range(first, last + 1):
+            encrypted = f.read(CHUNK_SIZE + TAG_SIZE)
+            chunk = _cache_key.decrypt(_chunk_nonce(nonce_prefix, index), encrypted, _chunk_aad(index, index == chunk_count - 1))
+
+            # Trim the first and last chunks to the requested range
+            chunk_start = index * CHUNK_SIZE
+            yield chunk[max(start - chunk_start, 0):end - chunk_start + 1]
+
+def evict():
+    """
+    Removes least recently used attachments until the cache fits ATTACHMENT_CACHE_MAX_BYTES
+    """
+    entries = []
+    total = 0
+    for root, _, files in os.walk(settings.ATTACHMENT_CACHE_DIR):
+        for name in files:
+            if name.startswith(TEMP_PREFIX):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    # Reads touch the file's mtime, so the oldest mtime is the least recently used
+    entries.sort()
+    for _, file_size, path in entries:
+        if total <= settings.ATTACHMENT_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= file_size
+
+def parse_range_header(range_header: str, size: int):
+    """
+    Parses a single 'bytes=' Range header into an inclusive (start, end) pair.
+    Returns None when the header is absent or malformed, and raises ValueError when it can't be satisfied.
+    """
+    if not range_header:
+        return None
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
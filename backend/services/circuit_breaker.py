@@ -0,0 +1,72 @@
+import time
+import redis
+from db.redis_client import get_redis
+
+class CircuitBreaker:
+    """
+    Redis-backed circuit breaker shared by every worker.
+    Closed: calls go through and failures are counted. After failure_threshold failures within cooldown_seconds it opens.
+    Open: calls are refused until cooldown_seconds pass. Half-open: one probe call at a time decides whether it closes or reopens
+    """
+    def __init__(self, name: str, failure_threshold: int, cooldown_seconds: int):
+        self.failures_key = f"breaker:{name}:failures"
+        self.open_key = f"breaker:{name}:open_until"
+        self.probe_key = f"breaker:{name}:probe"
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+    def state(self) -> str:
+        """
+        Returns "closed", "open" or "half_open"
+        """
+        try:
+            open_until = get_redis().get(self.open_key)
+        except redis.RedisError as e:
+            print(f"Circuit breaker error: {e}")
+            return "closed"
+        if open_until is None:
+            return "closed"
+        return "open" if time.time() < float(open_until) else "half_open"
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now. In the half-open state only the first caller gets the probe
+        """
+        state = self.state()
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        try:
+            return bool(get_redis().set(self.probe_key, 1, nx=True, ex=self.cooldown_seconds))
+        except redis.RedisError:
+            return True
+
+    def record_success(self):
+        try:
+            get_redis().delete(self.failures_key, self.open_key, self.probe_key)
+        except redis.RedisError as e:
+            print(f"Circuit breaker error: {e}")
+
+    def record_failure(self):
+        try:
+            r = get_redis()
+
+            # A failed probe reopens straight away
+            if self.state() == "half_open":
+                self._open(r)
+                return
+
+            failures = r.incr(self.failures_key)
+            if failures == 1:
+                r.expire(self.failures_key, self.cooldown_seconds)
+            if failures >= self.failure_threshold:
+                self._open(r)
+        except redis.RedisError as e:
+            print(f"Circuit breaker error: {e}")
+
+    def _open(self, r):
+        with r.pipeline() as pipe:
+            pipe.set(self.open_key, time.time() + self.cooldown_seconds)
+            pipe.delete(self.failures_key, self.probe_key)
+            pipe.execute()
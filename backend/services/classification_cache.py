@@ -0,0 +1,139 @@
+import hashlib
+import json
+import re
+import time
+from email.utils import parseaddr
+import numpy as np
+from config import settings
+from db.redis_client import get_redis
+
+# Redis layout:
+#   clscache:s:<sender>  hash of fingerprint (hex) -> {"category", "urgency"} JSON
+#   clscache:lru         sorted set of "<sender>|<fingerprint>" scored by last use, for LRU eviction
+#   clscache:stats       hit/miss/store/eviction counters
+PREFIX = "clscache"
+LRU_KEY = f"{PREFIX}:lru"
+STATS_KEY = f"{PREFIX}:stats"
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over the body's words, so near-identical bodies differ in only a few bits.
+    Single words rather than shingles: a changed word moves far fewer bits
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "big") for w in words or [""]],
+        dtype=">u8",
+    )
+
+    # Each word votes +1/-1 on every bit; the fingerprint keeps the majority
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1).astype(np.int64)
+    votes = bits.sum(axis=0) * 2 - len(hashes)
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+def _sender_key(sender: str) -> str:
+    address = parseaddr(sender or "")[1].lower()
+    if settings.CLASSIFICATION_CACHE_SCOPE == "domain":
+        return address.rpartition("@")[2]
+    return address
+
+def _distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def lookup_batch(items: list) -> dict:
+    """
+    Looks up (key, sender, masked_text) items. Returns a dict of key -> {"category", "urgency"}
+    for every item with a cached near-duplicate from the same sender
+    """
+    candidates = [(key, _sender_key(sender), simhash(text)) for key, sender, text in items if text and _sender_key(sender)]
+    if not candidates:
+        return {}
+
+    r = get_redis()
+    with r.pipeline(transaction=False) as pipe:
+        for _, sender, _ in candidates:
+            pipe.hgetall(f"{PREFIX}:s:{sender}")
+        buckets = pipe.execute()
+
+    hits = {}
+    touched = {}
+    for (key, sender, fingerprint), bucket in zip(candidates, buckets):
+        best = None
+        for stored, value in bucket.items():
+            distance = _distance(fingerprint, int(stored, 16))
+            if distance <= settings.CLASSIFICATION_CACHE_MAX_DISTANCE and (best is None or distance < best[0]):
+                best = (distance, stored.decode(), value)
+        if best:
+            hits[key] = json.loads(best[2])
+            touched[f"{sender}|{best[1]}"] = time.time()
+
+    with r.pipeline(transaction=False) as pipe:
+        if touched:
+            pipe.zadd(LRU_KEY, touched)
+        pipe.hincrby(STATS_KEY, "hits", len(hits))
+        pipe.hincrby(STATS_KEY, "misses", len(items) - len(hits))
+        pipe.execute()
+    return hits
+
+def store_batch(items: list):
+    """
+    Caches (sender, masked_text, category, urgency) items, evicting least recently used entries past the size bounds
+    """
+    entries = {}
+    for sender, text, category, urgency in items:
+        sender = _sender_key(sender)
+        if text and sender:
+            entries[(sender, f"{simhash(text):016x}")] = json.dumps({"category": category, "urgency": str(urgency)})
+    if not entries:
+        return
+
+    r = get_redis()
+    now = time.time()
+    senders = sorted({sender for sender, _ in entries})
+    with r.pipeline(transaction=False) as pipe:
+        for (sender, fingerprint), value in entries.items():
+            pipe.hset(f"{PREFIX}:s:{sender}", fingerprint, value)
+            pipe.zadd(LRU_KEY, {f"{sender}|{fingerprint}": now})
+        pipe.hincrby(STATS_KEY, "stores", len(entries))
+        for sender in senders:
+            pipe.hkeys(f"{PREFIX}:s:{sender}")
+        pipe.zcard(LRU_KEY)
+        results = pipe.execute()
+
+    # Trim senders over their own bound, then the whole cache
+    evicted = []
+    for sender, fingerprints in zip(senders, results[-1 - len(senders):-1]):
+        overflow = len(fingerprints) - settings.CLASSIFICATION_CACHE_MAX_PER_SENDER
+        if overflow > 0:
+            members = [f"{sender}|{f.decode()}" for f in fingerprints]
+            scores = r.zmscore(LRU_KEY, members)
+            evicted.extend(m for _, m in sorted(zip((s or 0 for s in scores), members))[:overflow])
+
+    overflow = results[-1] - len(evicted) - settings.CLASSIFICATION_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        already = set(evicted)
+        evicted.extend(m for m in (m.decode() for m in r.zrange(LRU_KEY, 0, overflow - 1)) if m not in already)
+    if evicted:
+        _evict(r, evicted)
+
+def _evict(r, members: list):
+    with r.pipeline(transaction=False) as pipe:
+        for member in members:
+            sender, _, fingerprint = member.rpartition("|")
+            pipe.hdel(f"{PREFIX}:s:{sender}", fingerprint)
+        pipe.zrem(LRU_KEY, *members)
+        pipe.hincrby(STATS_KEY, "evictions", len(members))
+        pipe.execute()
+
+def get_stats() -> dict:
+    """
+    Returns the shared cache counters and hit rate
+    """
+    r = get_redis()
+    stats = {k.decode(): int(v) for k, v in r.hgetall(STATS_KEY).items()}
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats["entries"] = r.zcard(LRU_KEY)
+    stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 3) if lookups else 0.0
+    return stats
@@ -1,130 +1,554 @@
 import base64
+import random
+import time
+from googleapiclient.errors import HttpError
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi.responses import Response
 from datetime import datetime, timezone
-from db.models import Email, User, Attachment
+from db.models import Email, User, Attachment, QuarantinedMessage
 from authent.token_service import get_gmail_service 
-from authent.encryption import encrypt_token, decrypt_token
+from services import attachment_cache
+from authent.encryption import BODY_MAGIC, encrypt_body, decrypt_body, decrypt_token, is_legacy_body
+from config import settings
 
-def get_email_body_content(msg_payload: dict):
+# Gmail rejects batches larger than 100 requests
+GMAIL_MAX_BATCH_SIZE = 100
+
+# Statuses worth retrying for a single item in a batch (rate limits and transient server errors)
+RETRYABLE_STATUSES = {429, 500, 503}
+
+# Labels of messages that are never stored during sync
+SKIPPED_LABELS = {'DRAFT', 'SPAM', 'TRASH'}
+
+# Headers kept with each email for the rules stage, which can classify mailing lists and bulk mail without a model
+RULE_HEADERS = ['List-Unsubscribe', 'List-Id', 'Precedence', 'Auto-Submitted']
+RULE_HEADER_NAMES = {name.lower() for name in RULE_HEADERS}
+
+# Headers requested when ingesting metadata-first
+METADATA_HEADERS = ['Subject', 'From'] + RULE_HEADERS
+
+def _part_headers(part: dict) -> dict:
+    '''
+    Returns a part's headers as a lowercase name -> value dict
+    '''
+    return {h['name'].lower(): h['value'] for h in part.get("headers", [])}
+
+def _decode_body_data(data: str, max_bytes: int) -> str:
+    '''
+    Decodes base64url body data, decoding only as much input as needed for max_bytes of output
     '''
-    Walks through the email payload to extract key information
+    # Every 4 base64 characters decode to 3 bytes, so slice the input before decoding
+    max_chars = -(-max_bytes // 3) * 4
+    if len(data) > max_chars:
+        data = data[:max_chars]
+    data += "=" * (-len(data) % 4)
+    return base64.urlsafe_b64decode(data)[:max_bytes].decode("utf-8", errors="replace")
+
+def get_email_body_content(msg_payload: dict, max_body_bytes: int = None):
+    '''
+    Walks through the email payload to extract key information.
+    The MIME tree is walked iteratively and the preferred body part is chosen before anything is decoded,
+    so only that part is decoded and at most max_body_bytes of it
     '''
-    html_body = ""
-    plain_text = ""
+    max_body_bytes = max_body_bytes or settings.MAX_BODY_BYTES
+    html_part = None
+    plain_part = None
     attachments = []
 
-    def walk_parts(parts):
-        nonlocal html_body, plain_text
-
-        # Walk through each part of the email payload
-        for part in parts:
-            mime_type = part.get("mimeType")
-            filename = part.get("filename")
-            body = part.get("body", {})
-            data = body.get("data")
-            attachment_id = body.get("attachmentId")
-
-            # Capture HTML, plain text, or attachments
-            if mime_type == "text/html" and data:
-                html_body = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
-            elif mime_type == "text/plain" and data:
-                plain_text = base64.urlsafe_b64decode(data).decode("utf-8", errors="replace")
-            elif filename and attachment_id:
-                attachments.append({
-                    "filename": filename,
-                    "mime_type": mime_type,
-                    "attachment_id": attachment_id,
-                    "size": body.get("size", 0)
-                })
-
-            if "parts" in part:
-                walk_parts(part["parts"])
-
-    walk_parts(msg_payload.get("parts", [msg_payload]))
-    
+    # Walk the parts depth-first in document order with an explicit stack
+    stack = list(reversed(msg_payload.get("parts", [msg_payload])))
+    while stack:
+        part = stack.pop()
+        mime_type = part.get("mimeType")
+        filename = part.get("filename")
+        body = part.get("body", {})
+        attachment_id = body.get("attachmentId")
+
+        headers = _part_headers(part)
+        disposition = headers.get("content-disposition", "").split(";")[0].strip().lower() or None
+        content_id = headers.get("content-id", "").strip().strip("<>") or None
+
+        # Remember the first HTML and plain text body parts, or capture attachments
+        if mime_type == "text/html" and body.get("data") and disposition != "attachment":
+            html_part = html_part or part
+        elif mime_type == "text/plain" and body.get("data") and disposition != "attachment":
+            plain_part = plain_part or part
+        elif filename and attachment_id:
+            attachments.append({
+                "filename": filename,
+                "mime_type": mime_type,
+                "attachment_id": attachment_id,
+                "size": body.get("size", 0),
+                "content_id": content_id,
+                "disposition": disposition,
+                # CID-referenced parts are embedded in the HTML unless explicitly marked as attachments
+                "is_inline": disposition == "inline" or (content_id is not None and disposition != "attachment")
+            })
+
+        if "parts" in part:
+            stack.extend(reversed(part["parts"]))
+
     # Prioritize HTML for the UI, fall back to Plain Text for simple emails
-    final_body = html_body if html_body else plain_text
-    return final_body, attachments
+    body_part = html_part or plain_part
+    if body_part is None:
+        return "", attachments
+    return _decode_body_data(body_part["body"]["data"], max_body_bytes), attachments
+
+def _is_retryable(exception: Exception) -> bool:
+    '''
+    Checks whether a per-item batch error is a rate limit or transient failure
+    '''
+    if not isinstance(exception, HttpError):
+        return False
+    status = exception.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+
+    # Gmail reports per-user rate limits as 403 with a rateLimitExceeded reason
+    return status == 403 and "rateLimitExceeded" in str(exception)
+
+def batch_get_messages(service, msg_ids: list, format: str = 'full', batch_size: int = None, max_retries: int = None, **kwargs) -> dict:
+    '''
+    Fetches messages through the Gmail batch endpoint, grouping up to batch_size requests per HTTP call.
+    Returns a dict of message ID -> message. Messages that keep failing are logged and left out.
+    '''
+    batch_size = min(batch_size or settings.GMAIL_BATCH_SIZE, GMAIL_MAX_BATCH_SIZE)
+    max_retries = settings.GMAIL_BATCH_MAX_RETRIES if max_retries is None else max_retries
+    messages = {}
+    pending = list(msg_ids)
+    attempt = 0
+
+    while pending:
+        retry_ids = []
+
+        # Collect each response (or error) without failing the whole batch
+        def on_response(request_id, response, exception):
+            if exception is None:
+                messages[request_id] = response
+            elif _is_retryable(exception):
+                retry_ids.append(request_id)
+            else:
+                print(f"Failed to fetch email {request_id}: {exception}")
+
+        for i in range(0, len(pending), batch_size):
+            batch = service.new_batch_http_request(callback=on_response)
+            for msg_id in pending[i:i + batch_size]:
+                batch.add(
+                    service.users().messages().get(userId='me', id=msg_id, format=format, **kwargs),
+                    request_id=msg_id
+                )
+            try:
+                batch.execute()
+            except HttpError as e:
+                # The batch request itself failed, so retry every item it carried
+                if not _is_retryable(e):
+                    raise
+                retry_ids.extend(msg_id for msg_id in pending[i:i + batch_size] if msg_id not in messages)
+
+        if not retry_ids:
+            break
+
+        attempt += 1
+        if attempt > max_retries:
+            print(f"Giving up on {len(retry_ids)} emails after {attempt - 1} retries")
+            break
+
+        # Exponential backoff with jitter before retrying only the rate limited items
+        time.sleep(min(2 ** attempt, 32) + random.random())
+        pending = retry_ids
+
+    return messages
+
+def _parse_metadata(user: User, msg: dict) -> dict:
+    '''
+    Builds an emails row from the message headers and metadata, without its body
+    '''
+    payload = msg.get('payload', {})
+
+    # Extract email headers for subject and sender information
+    headers = payload.get('headers', [])
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
+    sender = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown")
+    rule_headers = {h['name'].lower(): h['value'] for h in headers if h['name'].lower() in RULE_HEADER_NAMES}
+    
+    # Get email's internal timestamp and convert to datetime
+    internal_date_ms = int(msg.get('internalDate', 0))
+    received_timestamp = datetime.fromtimestamp(internal_date_ms / 1000.0, tz=timezone.utc)
+
+    return {
+        "user_id": user.id,
+        "email_id": msg['id'],
+        "thread_id": msg['threadId'],
+        "sender": sender,
+        "subject": subject,
+        "snippet": msg.get('snippet'),
+        "label_ids": msg.get('labelIds', []),
+        "headers": rule_headers,
+        "received_at": received_timestamp,
+        "body_text": None,
+        "is_processed": False,
+        "is_deleted": False,
+        "body_fetched": False
+    }
+
+def _parse_body(msg: dict):
+    '''
+    Extracts the encrypted body and attachment rows (without email IDs) from a format='full' message
+    '''
+    # Get HTML and Attachments
+    html_content, found_attachments = get_email_body_content(msg.get('payload', {}))
+
+    attachment_rows = [{
+        "filename": att['filename'],
+        "mime_type": att['mime_type'],
+        "google_attachment_id": att['attachment_id'],
+        "size": att['size'],
+        "content_id": att['content_id'],
+        "disposition": att['disposition'],
+        "is_inline": att['is_inline']
+    } for att in found_attachments]
+    return encrypt_body(html_content), attachment_rows
+
+def _quarantine(db: Session, user: User, failures: list):
+    '''
+    Records messages that could not be parsed so later syncs skip them instead of failing again
+    '''
+    if not failures:
+        return
+    for msg_id, error in failures:
+        print(f"Failed to process email {msg_id}: {error}")
+
+    db.execute(
+        pg_insert(QuarantinedMessage)
+        .values([{"user_id": user.id, "email_id": msg_id, "error": str(error)[:1000]} for msg_id, error in failures])
+        .on_conflict_do_nothing(index_elements=['user_id', 'email_id'])
+    )
+
+def _bulk_insert_attachments(db: Session, attachment_rows: list):
+    '''
+    Inserts attachment rows with a single multi-row INSERT
+    '''
+    if attachment_rows:
+        db.execute(pg_insert(Attachment).values(attachment_rows))
+
+def store_messages(db: Session, user: User, service, msg_ids: list) -> int:
+    '''
+    Fetches the given Gmail messages and stores the ones not already in the database. Returns the number stored.
+    With INGEST_METADATA_FIRST only headers and snippet are stored, and bodies are fetched later.
+    '''
+    if not msg_ids:
+        return 0
+
+    # Skip emails already stored or quarantined, to avoid refetching them
+    existing_records = db.query(Email.email_id).filter(Email.user_id == user.id, Email.email_id.in_(msg_ids)).all()
+    quarantined_records = db.query(QuarantinedMessage.email_id)\
+        .filter(QuarantinedMessage.user_id == user.id, QuarantinedMessage.email_id.in_(msg_ids)).all()
+    existing_ids = {record[0] for record in existing_records + quarantined_records}
+
+    # Fetch every new message in as few HTTP round trips as possible
+    new_ids = [msg_id for msg_id in dict.fromkeys(msg_ids) if msg_id not in existing_ids]
+    with_body = not settings.INGEST_METADATA_FIRST
+    if with_body:
+        fetched = batch_get_messages(service, new_ids, format='full')
+    else:
+        fetched = batch_get_messages(service, new_ids, format='metadata', metadataHeaders=METADATA_HEADERS)
+
+    # Parse the whole page up front. Messages that fail are quarantined rather than rolled back one by one
+    email_rows = []
+    attachments_by_msg = {}
+    failures = []
+    for msg_id in new_ids:
+
+        # Skip if the batch could not fetch the email
+        msg = fetched.get(msg_id)
+        if msg is None:
+            continue
+        
+        try:
+            row = _parse_metadata(user, msg)
+            if with_body:
+                row["body_text"], attachments_by_msg[msg_id] = _parse_body(msg)
+                row["body_fetched"] = True
+            email_rows.append(row)
+        except Exception as e:
+            failures.append((msg_id, e))
+    _quarantine(db, user, failures)
+
+    if not email_rows:
+        return 0
+
+    # Write the page with one multi-row INSERT. Emails stored concurrently by another sync are skipped by the unique constraint
+    inserted = db.execute(
+        pg_insert(Email)
+        .values(email_rows)
+        .on_conflict_do_nothing(index_elements=['user_id', 'email_id'])
+        .returning(Email.id, Email.email_id)
+    ).all()
+
+    # Attach the attachments of the emails that were actually inserted
+    _bulk_insert_attachments(db, [
+        {**att, "email_id": row_id}
+        for row_id, msg_id in inserted
+        for att in attachments_by_msg.get(msg_id, [])
+    ])
+    return len(inserted)
+
+def fetch_email_bodies(db: Session, user: User, emails: list, max_retries: int = None, skip_locked: bool = True) -> int:
+    '''
+    Downloads and stores the full bodies of emails ingested metadata-first. Returns the number of bodies fetched.
+    The rows are locked until the commit, so concurrent fetches never download a body or insert its attachments twice.
+    Rows another fetch holds are skipped, or with skip_locked=False waited on, and either way left to that fetch
+    '''
+    pending_ids = [email.id for email in emails if not email.body_fetched]
+    if not pending_ids:
+        return 0
+
+    # Postgres rechecks body_fetched after waiting on a lock, so rows another fetch just stored drop out here
+    pending = db.query(Email)\
+        .filter(Email.id.in_(pending_ids), Email.body_fetched == False)\
+        .with_for_update(skip_locked=skip_locked)\
+        .populate_existing()\
+        .all()
+    if not pending:
+        db.commit()
+        return 0
+
+    service = get_gmail_service(db, user)
+    fetched = batch_get_messages(service, [email.email_id for email in pending], format='full', max_retries=max_retries)
+    attachment_rows = []
+    failures = []
+    stored = 0
+
+    for email in pending:
+        msg = fetched.get(email.email_id)
+        if msg is None:
+            continue
+        try:
+            body_text, email_attachments = _parse_body(msg)
+        except Exception as e:
+            # Quarantined bodies are never fetched again, so the email keeps its metadata without a body
+            failures.append((email.email_id, e))
+            email.body_fetched = True
+            continue
+
+        email.body_text = body_text
+        email.body_fetched = True
+        attachment_rows.extend({**att, "email_id": email.id} for att in email_attachments)
+        stored += 1
+
+    _quarantine(db, user, failures)
+    _bulk_insert_attachments(db, attachment_rows)
+    db.commit()
+    return stored
+
+def fetch_pending_bodies(db: Session, user: User, limit: int = None, after: list = None):
+    '''
+    Fetches bodies for the user's newest emails that only have metadata so far, newest first.
+    after is the cursor returned by the previous chunk. Returns (number fetched, cursor for the next chunk),
+    where the cursor is None once every pending email has been scanned.
+    '''
+    limit = limit or settings.BODY_FETCH_CHUNK_SIZE
+    query = db.query(Email).filter(Email.user_id == user.id, Email.body_fetched == False)
+
+    # Page past emails already scanned, so ones Gmail can't return don't hold up the rest
+    if after:
+        query = query.filter(tuple_(Email.received_at, Email.id) < (datetime.fromisoformat(after[0]), after[1]))
+    emails = query.order_by(Email.received_at.desc(), Email.id.desc()).limit(limit).all()
+
+    cursor = [emails[-1].received_at.isoformat(), emails[-1].id] if len(emails) == limit else None
+    return fetch_email_bodies(db, user, emails), cursor
+
+def full_resync(db: Session, user: User, service) -> str:
+    '''
+    Lists emails received after signup (up to GMAIL_FULL_RESYNC_MAX_MESSAGES) and stores the new ones.
+    Returns the mailbox historyId to checkpoint from.
+    '''
+    # Read the checkpoint before listing so anything arriving mid-sync is picked up by the next incremental sync
+    history_id = service.users().getProfile(userId='me').execute().get('historyId')
+
+    # Only fetch emails received after the user's signup date
+    signup_timestamp = int(user.created_at.timestamp())
+    query = f"after:{signup_timestamp}"
+
+    # Page through the list of email IDs matching the query, bounded to keep the resync cheap
+    msg_ids = []
+    page_token = None
+    while len(msg_ids) < settings.GMAIL_FULL_RESYNC_MAX_MESSAGES:
+        results = service.users().messages().list(
+            userId="me",
+            q=query,
+            maxResults=min(500, settings.GMAIL_FULL_RESYNC_MAX_MESSAGES - len(msg_ids)),
+            pageToken=page_token
+        ).execute()
+        msg_ids.extend(msg['id'] for msg in results.get('messages', []))
+
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+    store_messages(db, user, service, msg_ids)
+    return history_id
+
+def incremental_sync(db: Session, user: User, service) -> str:
+    '''
+    Applies every mailbox change since the user's history checkpoint. Returns the new historyId.
+    Raises HttpError 404 if the checkpoint is too old for Gmail to replay.
+    '''
+    added_ids = []
+    deleted_ids = set()
+    trashed_ids = {}
+    history_id = user.history_id
+    page_token = None
+
+    # Walk every page of history records since the checkpoint
+    while True:
+        results = service.users().history().list(
+            userId='me',
+            startHistoryId=user.history_id,
+            historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+            pageToken=page_token
+        ).execute()
+        history_id = results.get('historyId', history_id)
+
+        for record in results.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message = added['message']
+
+                # Drafts, spam, and trash never show up in the regular sync either
+                if SKIPPED_LABELS.isdisjoint(message.get('labelIds', [])):
+                    added_ids.append(message['id'])
+
+            for deleted in record.get('messagesDeleted', []):
+                deleted_ids.add(deleted['message']['id'])
+
+            # Track moves in and out of the trash, the last change wins
+            for labelled in record.get('labelsAdded', []):
+                if 'TRASH' in labelled.get('labelIds', []):
+                    trashed_ids[labelled['message']['id']] = True
+            for unlabelled in record.get('labelsRemoved', []):
+                if 'TRASH' in unlabelled.get('labelIds', []):
+                    trashed_ids[unlabelled['message']['id']] = False
+
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+    # Store messages that were added and not removed again within the same window
+    store_messages(db, user, service, [msg_id for msg_id in added_ids if msg_id not in deleted_ids])
+
+    # Flag deleted or trashed emails, and restore emails moved back out of the trash
+    for msg_id, trashed in trashed_ids.items():
+        if msg_id not in deleted_ids:
+            db.query(Email).filter(Email.user_id == user.id, Email.email_id == msg_id)\
+                .update({Email.is_deleted: trashed}, synchronize_session=False)
+    if deleted_ids:
+        db.query(Email).filter(Email.user_id == user.id, Email.email_id.in_(deleted_ids))\
+            .update({Email.is_deleted: True}, synchronize_session=False)
+
+    return history_id
 
 def fetch_and_store_emails(db: Session, user: User): 
     '''
     Fetches emails from Gmail API and stores them in the database.
+    Uses the user's history checkpoint when possible, falling back to a bounded full resync.
     '''
     service = get_gmail_service(db, user)
 
-    # Only fetch emails received after the user's signup date
+    history_id = None
+    if user.history_id:
+        try:
+            history_id = incremental_sync(db, user, service)
+        except HttpError as e:
+            # Gmail only keeps history for a limited time, so an expired checkpoint returns 404
+            if e.resp.status != 404:
+                raise
+            print(f"History checkpoint expired for user {user.id}, running full resync")
+            db.rollback()
+
+    if history_id is None:
+        history_id = full_resync(db, user, service)
+
+    # Save the new checkpoint together with the synced emails
+    user.history_id = history_id
+    db.commit()
+
+def backfill_emails(db: Session, user: User, max_pages: int = None, on_page=None) -> bool:
+    '''
+    Streams through every page of emails received after signup, committing one chunk at a time.
+    The next page token is saved with each chunk so a crashed or restarted worker resumes where it stopped.
+    on_page, if given, is called after each committed chunk. Returns True once the whole mailbox has been ingested.
+    '''
+    if user.backfill_completed_at:
+        return True
+
+    service = get_gmail_service(db, user)
     signup_timestamp = int(user.created_at.timestamp())
     query = f"after:{signup_timestamp}"
+    page_token = user.backfill_page_token
+    pages = 0
 
-    # Fetch the list of email IDs matching the query
-    results = service.users().messages().list(userId="me", maxResults=20, q=query).execute()
-    messages = results.get('messages', [])
+    while max_pages is None or pages < max_pages:
+        try:
+            results = service.users().messages().list(
+                userId="me",
+                q=query,
+                maxResults=settings.BACKFILL_CHUNK_SIZE,
+                pageToken=page_token
+            ).execute()
+        except HttpError as e:
+            # Page tokens eventually expire, so restart from the top and let deduplication skip stored emails
+            if e.resp.status != 400 or not page_token:
+                raise
+            print(f"Backfill cursor expired for user {user.id}, restarting backfill")
+            page_token = None
+            continue
 
-    if not messages:
-        return
+        store_messages(db, user, service, [msg['id'] for msg in results.get('messages', [])])
+        pages += 1
 
-    # Fetch all maxResults emails from DB to avoid multiple queries in the loop
-    fetched_msg_ids = [msg['id'] for msg in messages]
-    existing_records = db.query(Email.email_id).filter(Email.email_id.in_(fetched_msg_ids)).all()
-    existing_ids = {record[0] for record in existing_records}
+        # Commit the chunk together with the cursor. Committed emails are released from the
+        # session, so memory use stays flat regardless of mailbox size
+        page_token = results.get('nextPageToken')
+        user.backfill_page_token = page_token
+        if not page_token:
+            user.backfill_completed_at = datetime.now(timezone.utc)
+        db.commit()
 
-    # Process each email message
-    for msg_info in messages:
-        msg_id = msg_info['id']
-        
-        # Skip if email has already been fetched
-        if msg_id in existing_ids:
+        if not page_token:
+            return True
+        if on_page:
+            on_page()
+
+    return False
+
+def reencode_legacy_bodies(db: Session, after_id: int = 0, limit: int = None):
+    '''
+    Re-encrypts a chunk of legacy Fernet bodies into the compressed envelope format.
+    Returns the last email ID scanned, or None once every row has been migrated.
+    '''
+    emails = db.query(Email)\
+        .filter(
+            Email.id > after_id,
+            Email.body_text.isnot(None),
+            func.substring(Email.body_text, 1, len(BODY_MAGIC)) != BODY_MAGIC
+        )\
+        .order_by(Email.id)\
+        .limit(limit or settings.BODY_REENCODE_BATCH_SIZE)\
+        .all()
+    if not emails:
+        return None
+
+    for email in emails:
+        if not is_legacy_body(email.body_text):
             continue
-        
         try:
-            # Use a nested transaction to ensure that if any step fails, we can roll back just that email's processing without affecting others
-            with db.begin_nested(): 
-                msg = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
-                payload = msg.get('payload')
-            
-                # Get HTML and Attachments
-                html_content, found_attachments = get_email_body_content(payload) 
-                
-                # Extract email headers for subject and sender information
-                headers = payload.get('headers', [])
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown")
-                
-                # Get email's internal timestamp and convert to datetime
-                internal_date_ms = int(msg.get('internalDate', 0))
-                received_timestamp = datetime.fromtimestamp(internal_date_ms / 1000.0, tz=timezone.utc)
-
-                # Create Email record
-                email_record = Email(
-                    user_id=user.id,
-                    email_id=msg_id,
-                    thread_id=msg_info.get('threadId'),
-                    sender=sender,
-                    subject=subject,
-                    received_at=received_timestamp,
-                    body_text=encrypt_token(html_content),
-                    is_processed=False
-                )
-                db.add(email_record)
-                db.flush()
-
-                # Create Attachment records
-                for att in found_attachments:
-                    db_att = Attachment(
-                        email_id=email_record.id,
-                        filename=att['filename'],
-                        mime_type=att['mime_type'],
-                        google_attachment_id=att['attachment_id'],
-                        size=att['size']
-                    )
-                    db.add(db_att)
-        
-        # Catch any exceptions during processing of an email, log it, and continue with the next one
+            email.body_text = encrypt_body(decrypt_token(email.body_text))
         except Exception as e:
-            print(f"Failed to process email {msg_id}: {e}")
-            continue
+            print(f"Failed to re-encode body for email {email.id}: {e}")
     db.commit()
+    return emails[-1].id
 
 def get_recent_emails_for_user(db: Session, user_id: int, limit: int = 50):
     """
@@ -136,18 +560,32 @@ def get_recent_emails_for_user(db: Session, user_id: int, limit: int = 50):
         .limit(limit)\
         .all()
 
-def get_email_details(db: Session, user_id: int, email_id: int):
+def _is_inline_attachment(att: Attachment) -> bool:
+    """
+    Checks whether an attachment is embedded in the body (e.g. signature images) rather than a real file
+    """
+    if att.is_inline is not None:
+        return att.is_inline
+
+    # Rows stored before dispositions were recorded fall back to filename heuristics
+    return "signature" in att.filename.lower() or "image" in att.filename.lower()
+
+def get_email_details(db: Session, user: User, email_id: int):
     """
     Fetches a specific email, decrypts its body, and formats attachments
     """
-    email = db.query(Email).filter(Email.id == email_id, Email.user_id == user_id).first()
+    email = db.query(Email).filter(Email.id == email_id, Email.user_id == user.id).first()
+
+    # Download the body on first open if the email was ingested metadata-first. Someone is waiting, so retry briefly
+    if email and not email.body_fetched:
+        fetch_email_bodies(db, user, [email], max_retries=settings.GMAIL_INTERACTIVE_MAX_RETRIES, skip_locked=False)
     
     # If email doesn't exist or has no body, return a default message
     if not email or not email.body_text:
         return {"body": "No content available.", "attachments": []}
 
     try:
-        decrypted_body = decrypt_token(email.body_text)
+        decrypted_body = decrypt_body(email.body_text)
         
         # Obtain attachments
         valid_attachments = [
@@ -158,7 +596,7 @@ def get_email_details(db: Session, user_id: int, email_id: int):
                 "url": att.google_attachment_id,
                 "size": att.size
             } for att in email.attachments 
-            if att.filename and "signature" not in att.filename.lower() and "image" not in att.filename.lower()
+            if att.filename and not _is_inline_attachment(att)
         ]
 
         return {
@@ -171,7 +609,8 @@ def get_email_details(db: Session, user_id: int, email_id: int):
     
 def download_attachment(db: Session, user: User, email_id: int, attachment_id: int):
     """
-    Fetches raw attachment data from Google API and decodes it.
+    Returns (content_hash, size, mime_type, filename) for an attachment in the local cache,
+    fetching it from the Google API on a cache miss.
     """
     # Get the email and attachment records
     email_record = db.query(Email).filter(Email.id == email_id, Email.user_id == user.id).first()
@@ -182,6 +621,10 @@ def download_attachment(db: Session, user: User, email_id: int, attachment_id: i
     if not attachment_record:
         raise Exception("Attachment not found")
 
+    # Serve repeat downloads straight from the cache
+    if attachment_cache.contains(attachment_record.content_hash):
+        return attachment_record.content_hash, attachment_record.size, attachment_record.mime_type, attachment_record.filename
+
     # Fetch the raw data from Gmail API
     service = get_gmail_service(db, user)
     try:
@@ -191,10 +634,14 @@ def download_attachment(db: Session, user: User, email_id: int, attachment_id: i
             id=attachment_record.google_attachment_id # Google's attachment ID
         ).execute()
         
-        # Decode the base64 URL-safe string
-        file_data = base64.urlsafe_b64decode(attachment_obj['data'])
-        return file_data, attachment_record.mime_type, attachment_record.filename
-        
+        # The API returns the whole attachment as one base64 string, so a cache miss holds it in memory
+        # while it is decoded into the cache chunk by chunk. Cache hits stream from disk
+        content_hash, size = attachment_cache.store(attachment_obj.pop('data'))
     except Exception as e:
         print(f"Failed to fetch attachment: {e}")
-        raise Exception("Could not retrieve attachment from Google")
\ No newline at end of file
+        raise Exception("Could not retrieve attachment from Google")
+
+    attachment_record.content_hash = content_hash
+    attachment_record.size = size
+    db.commit()
+    return content_hash, size, attachment_record.mime_type, attachment_record.filename
@@ -0,0 +1,53 @@
+import re
+import numpy as np
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_PATTERN = re.compile(r"\w+")
+
+def _pagerank(similarity: np.ndarray, damping: float = 0.85, iterations: int = 50, tolerance: float = 1e-6) -> np.ndarray:
+    n = len(similarity)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+
+    # Sentences similar to nothing link evenly to every sentence
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1 / n), where=row_sums > 0)
+    scores = np.full(n, 1 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * transition.T @ scores
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+def summarize(text: str, max_words: int = 25) -> str:
+    """
+    TextRank extractive summary: ranks sentences by their similarity to the rest of the text
+    and keeps the best ones, in their original order, up to about max_words
+    """
+    sentences = [s.strip() for s in SENTENCE_PATTERN.split(text or "") if len(WORD_PATTERN.findall(s)) >= 3]
+    if not sentences:
+        return " ".join((text or "").split()[:max_words])
+    if len(sentences) > 1:
+        # Log-scaled word counts per sentence, L2-normalized, so the similarity matrix is a single product
+        tokenized = [WORD_PATTERN.findall(s.lower()) for s in sentences]
+        vocabulary = {word: index for index, word in enumerate({w for words in tokenized for w in words})}
+        counts = np.zeros((len(sentences), len(vocabulary)))
+        for row, words in enumerate(tokenized):
+            np.add.at(counts[row], [vocabulary[w] for w in words], 1)
+        vectors = np.log1p(counts)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, 0)
+        ranked = np.argsort(-_pagerank(similarity), kind="stable")
+    else:
+        ranked = [0]
+
+    chosen = []
+    words = 0
+    for index in ranked:
+        chosen.append(index)
+        words += len(sentences[index].split())
+        if words >= max_words:
+            break
+    summary = " ".join(sentences[index] for index in sorted(chosen)).split()
+    return " ".join(summary[:max_words]) + ("..." if len(summary) > max_words else "")
@@ -0,0 +1,222 @@
+import re
+
+# Optional C-backed parsers, fastest first. BeautifulSoup is always available as the fallback
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+from bs4 import BeautifulSoup, NavigableString
+from bs4.element import PreformattedString
+
+# Elements whose content is never visible text
+SKIPPED_TAGS = {"script", "style", "head", "title", "noscript", "template", "svg"}
+
+# Inline styles used to hide preheaders and tracking text
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden|(?<![-\w])(?:max-)?height\s*:\s*0(?:px)?\s*(?:;|$)|font-size\s*:\s*0(?:px)?\s*(?:;|$)", re.I)
+
+# Containers mail clients wrap around quoted history and signatures
+QUOTED_TAGS = {"blockquote"}
+QUOTED_CLASSES = {"gmail_quote", "gmail_signature", "gmail_extra", "yahoo_quoted", "moz-cite-prefix", "moz-signature"}
+QUOTED_IDS = {"divRplyFwdMsg", "appendonsend", "Signature"}
+
+# Elements that start a new line of text
+BLOCK_TAGS = {
+    "p", "div", "br", "hr", "li", "ul", "ol", "dl", "dt", "dd", "table", "tr", "td", "th", "pre", "address",
+    "blockquote", "section", "article", "header", "footer", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+
+class _Marker:
+    """
+    Structure the walkers yield between text pieces
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self):
+        return f"<{self.name}>"
+
+BLOCK_BREAK = _Marker("block")
+QUOTE_START = _Marker("quote start")
+QUOTE_END = _Marker("quote end")
+
+def _is_quoted(tag: str, attributes) -> bool:
+    """
+    Checks whether an element holds quoted replies or a signature rather than the message itself
+    """
+    if tag in QUOTED_TAGS or (attributes.get("id") or "") in QUOTED_IDS:
+        return True
+    classes = attributes.get("class") or ""
+    if not isinstance(classes, str):
+        classes = " ".join(classes)
+    return not QUOTED_CLASSES.isdisjoint(classes.split())
+
+def _is_hidden(attributes) -> bool:
+    """
+    Checks an element's attributes for the common ways of hiding it
+    """
+    if "hidden" in attributes or (attributes.get("aria-hidden") or "").lower() == "true":
+        return True
+    return bool(HIDDEN_STYLE.search(attributes.get("style") or ""))
+
+# What _markers returns for each kind of element, as (opening, closing)
+NO_MARKERS = ((), ())
+BLOCK_MARKERS = ((BLOCK_BREAK,), (BLOCK_BREAK,))
+QUOTE_MARKERS = ((QUOTE_START,), (QUOTE_END,))
+QUOTED_BLOCK_MARKERS = ((BLOCK_BREAK, QUOTE_START), (QUOTE_END, BLOCK_BREAK))
+
+def _markers(tag: str, attributes) -> tuple:
+    """
+    Returns the markers to yield before an element's content and after it, in order
+    """
+    block = tag in BLOCK_TAGS
+    if _is_quoted(tag, attributes):
+        return QUOTED_BLOCK_MARKERS if block else QUOTE_MARKERS
+    return BLOCK_MARKERS if block else NO_MARKERS
+
+def _collect(items, max_chars: int) -> tuple:
+    """
+    Joins stripped strings into lines, breaking at block elements, until max_chars of text has been collected.
+    Returns (all text, text outside quoted containers)
+    """
+    lines, unquoted_lines = [[]], [[]]
+    depth = 0
+    total = 0
+    for item in items:
+        if item is BLOCK_BREAK:
+            for current in (lines, unquoted_lines):
+                if current[-1]:
+                    current.append([])
+        elif item is QUOTE_START:
+            depth += 1
+        elif item is QUOTE_END:
+            depth -= 1
+        else:
+            text = item.strip()
+            if not text:
+                continue
+            lines[-1].append(text)
+            if not depth:
+                unquoted_lines[-1].append(text)
+            total += len(text) + 1
+            if max_chars and total >= max_chars:
+                break
+    return "\n".join(" ".join(line) for line in lines if line), "\n".join(" ".join(line) for line in unquoted_lines if line)
+
+def _strings_selectolax(html: str):
+    tree = LexborHTMLParser(html)
+    root = tree.body or tree.root
+    if root is None:
+        return
+
+    # Walk the DOM with an explicit stack, dropping invisible subtrees. Closing markers wait on the stack under the children
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _Marker):
+            yield node
+            continue
+        if node.tag == "-text":
+            yield node.text_content or ""
+            continue
+        if node.tag in SKIPPED_TAGS or node.tag == "_comment":
+            continue
+
+        # selectolax builds a new dict on every attributes access
+        attributes = node.attributes
+        if _is_hidden(attributes):
+            continue
+        opening, closing = _markers(node.tag, attributes)
+        yield from opening
+        stack.extend(reversed(closing))
+        children = []
+        child = node.child
+        while child is not None:
+            children.append(child)
+            child = child.next
+        stack.extend(reversed(children))
+
+def _strings_lxml(html: str):
+    root = lxml.html.document_fromstring(html)
+
+    # Each element yields its text, then its children, then its tail (which belongs to the parent)
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (str, _Marker)):
+            yield item
+            continue
+        if item.tail:
+            stack.append(item.tail)
+        if not isinstance(item.tag, str) or item.tag in SKIPPED_TAGS or _is_hidden(item.attrib):
+            continue
+        opening, closing = _markers(item.tag, item.attrib)
+        yield from opening
+        stack.extend(reversed(closing))
+        stack.extend(reversed(list(item)))
+        if item.text:
+            yield item.text
+
+def _strings_bs4(html: str):
+    stack = [BeautifulSoup(html, "html.parser")]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _Marker):
+            yield node
+            continue
+
+        # Comments, doctypes and the like are strings too, but never visible
+        if isinstance(node, NavigableString):
+            if not isinstance(node, PreformattedString):
+                yield str(node)
+            continue
+        if node.name in SKIPPED_TAGS or _is_hidden(node.attrs):
+            continue
+        opening, closing = _markers(node.name, node.attrs)
+        yield from opening
+        stack.extend(reversed(closing))
+        stack.extend(reversed(node.contents))
+
+BACKENDS = {
+    "selectolax": _strings_selectolax if LexborHTMLParser else None,
+    "lxml": _strings_lxml if lxml else None,
+    "bs4": _strings_bs4,
+}
+
+def available_backends() -> list:
+    """
+    Lists the parsers installed in this environment, fastest first
+    """
+    return [name for name, strings in BACKENDS.items() if strings]
+
+def extract_text_parts(html: str, max_chars: int = None, backend: str = None) -> tuple:
+    """
+    Extracts visible text from an HTML email, skipping scripts, styles, and hidden elements. Block elements start new lines.
+    Stops once max_chars of text has been collected, so huge bodies aren't walked in full.
+    Returns (text, unquoted_text) from a single parse, where unquoted_text also skips the quoted replies
+    and signatures marked up by the sender's mail client
+    """
+    if not html:
+        return "", ""
+    backend = backend or available_backends()[0]
+    try:
+        return _collect(BACKENDS[backend](html), max_chars)
+    except Exception as e:
+        # Fall back to the forgiving pure-Python parser for markup the C parsers reject
+        if backend == "bs4":
+            raise
+        print(f"{backend} failed to parse email HTML, falling back to BeautifulSoup: {e}")
+        return _collect(_strings_bs4(html), max_chars)
+
+def extract_text(html: str, max_chars: int = None, backend: str = None, drop_quoted: bool = False) -> str:
+    """
+    Extracts visible text from an HTML email, as extract_text_parts does.
+    With drop_quoted, quoted replies and signatures are skipped too
+    """
+    text, unquoted_text = extract_text_parts(html, max_chars, backend)
+    return unquoted_text if drop_quoted else text
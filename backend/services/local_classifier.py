@@ -0,0 +1,194 @@
+import glob
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+import numpy as np
+from config import settings
+
+# Bump when features or the file layout change; files from another version are ignored
+MODEL_FORMAT_VERSION = 1
+MODEL_PREFIX = "local-classifier"
+
+# Labels written when the LLM failed, which would teach the model nothing useful
+UNTRAINABLE_CATEGORIES = ("Error", "Uncategorized")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def extract_features(sender: str, subject: str, text: str, dim: int) -> np.ndarray:
+    """
+    Hashes word unigrams and bigrams of each field into a sorted array of unique feature indices.
+    Field prefixes keep "invoice" in a subject apart from "invoice" in a body
+    """
+    sender = (sender or "").lower()
+    tokens = []
+    for field, value in (("f", sender), ("d", sender.rpartition("@")[2]), ("s", subject or ""), ("b", text or "")):
+        words = TOKEN_PATTERN.findall(value.lower())
+        tokens.extend(f"{field}:{word}" for word in words)
+        tokens.extend(f"{field}:{a}_{b}" for a, b in zip(words, words[1:]))
+
+    # crc32 rather than hash(), which is salted per process
+    indices = [zlib.crc32(token.encode()) % dim for token in tokens]
+    return np.unique(np.array(indices, dtype=np.int64))
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+def _fit_head(features: list, labels: list, dim: int, epochs: int, learning_rate: float, l2: float):
+    """
+    Multinomial logistic regression over binary hashed features, trained full-batch with AdaGrad.
+    Returns (classes, weights, bias)
+    """
+    classes, targets = np.unique(np.array(labels), return_inverse=True)
+    n, c = len(features), len(classes)
+
+    # Flattened sparse matrix: feature index and row number of every nonzero
+    indices = np.concatenate(features)
+    rows = np.repeat(np.arange(n), [len(f) for f in features])
+    one_hot = np.eye(c)[targets]
+
+    weights = np.zeros((dim, c))
+    bias = np.zeros(c)
+    weight_history = np.full((dim, c), 1e-8)
+    bias_history = np.full(c, 1e-8)
+    for _ in range(epochs):
+        logits = np.stack([np.bincount(rows, weights=weights[indices, k], minlength=n) for k in range(c)], axis=1) + bias
+        error = (_softmax(logits) - one_hot) / n
+
+        grad = np.stack([np.bincount(indices, weights=error[rows, k], minlength=dim) for k in range(c)], axis=1)
+        grad += l2 * weights
+        bias_grad = error.sum(axis=0)
+
+        weight_history += grad ** 2
+        bias_history += bias_grad ** 2
+        weights -= learning_rate * grad / np.sqrt(weight_history)
+        bias -= learning_rate * bias_grad / np.sqrt(bias_history)
+
+    return classes, weights.astype(np.float32), bias.astype(np.float32)
+
+class LocalClassifier:
+    """
+    Category and urgency heads over shared hashed n-gram features
+    """
+    def __init__(self, arrays: dict, metadata: dict):
+        self.arrays = arrays
+        self.metadata = metadata
+        self.dim = metadata["feature_dim"]
+        self.path = None
+
+    @classmethod
+    def train(cls, samples: list, dim: int = 2 ** 18, epochs: int = 60, learning_rate: float = 0.5, l2: float = 1e-6):
+        """
+        Trains on (sender, subject, masked_text, category, urgency) tuples
+        """
+        features = [extract_features(sender, subject, text, dim) for sender, subject, text, _, _ in samples]
+        arrays = {}
+        for head, position in (("category", 3), ("urgency", 4)):
+            classes, weights, bias = _fit_head(features, [str(s[position]) for s in samples], dim, epochs, learning_rate, l2)
+            arrays[f"{head}_classes"] = classes.astype(str)
+            arrays[f"{head}_weights"] = weights
+            arrays[f"{head}_bias"] = bias
+
+        metadata = {
+            "format_version": MODEL_FORMAT_VERSION,
+            "feature_dim": dim,
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+            "samples": len(samples),
+        }
+        return cls(arrays, metadata)
+
+    def predict(self, sender: str, subject: str, text: str) -> dict:
+        """
+        Returns the most likely category and urgency, with confidence as the lower of the two probabilities
+        """
+        features = extract_features(sender, subject, text, self.dim)
+        prediction = {}
+        confidence = 1.0
+        for head in ("category", "urgency"):
+            logits = self.arrays[f"{head}_weights"][features].sum(axis=0) + self.arrays[f"{head}_bias"]
+            probabilities = _softmax(logits)
+            best = int(probabilities.argmax())
+            prediction[head] = str(self.arrays[f"{head}_classes"][best])
+            confidence = min(confidence, float(probabilities[best]))
+        prediction["confidence"] = confidence
+        return prediction
+
+    def save(self, directory: str) -> str:
+        """
+        Writes a new timestamped model file and returns its path
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        path = os.path.join(directory, f"{MODEL_PREFIX}-v{MODEL_FORMAT_VERSION}-{stamp}.npz")
+        np.savez_compressed(path, metadata=np.array(json.dumps(self.metadata)), **self.arrays)
+        self.path = path
+        return path
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if metadata.get("format_version") != MODEL_FORMAT_VERSION:
+                raise ValueError(f"{path} has model format {metadata.get('format_version')}, expected {MODEL_FORMAT_VERSION}")
+            arrays = {key: data[key] for key in data.files if key != "metadata"}
+        model = cls(arrays, metadata)
+        model.path = path
+        return model
+
+def latest_model_path(directory: str):
+    """
+    Returns the newest model file of the current format, or None
+    """
+    paths = sorted(glob.glob(os.path.join(directory, f"{MODEL_PREFIX}-v{MODEL_FORMAT_VERSION}-*.npz")))
+    return paths[-1] if paths else None
+
+# Each worker keeps the loaded model and looks for a newer file at most every LOCAL_CLASSIFIER_RELOAD_SECONDS
+_model = None
+_checked_at = 0.0
+
+def get_model():
+    """
+    Returns the newest trained model, or None when there is none yet
+    """
+    global _model, _checked_at
+    if time.monotonic() - _checked_at < settings.LOCAL_CLASSIFIER_RELOAD_SECONDS:
+        return _model
+    _checked_at = time.monotonic()
+
+    path = latest_model_path(settings.LOCAL_CLASSIFIER_DIR)
+    if path and (_model is None or _model.path != path):
+        try:
+            _model = LocalClassifier.load(path)
+            logging.info(f"Loaded local classifier {path}")
+        except Exception as e:
+            print(f"Local classifier load error: {e}")
+    return _model
+
+def is_holdout(email_id: int) -> bool:
+    """
+    Every tenth email is kept out of training so evaluation always sees unseen rows
+    """
+    return email_id % 10 == 0
+
+def load_labelled_emails(db) -> list:
+    """
+    Returns (id, sender, subject, masked_text, category, urgency) for every email labelled by the LLM
+    whose masked text is cached
+    """
+    from authent.encryption import decrypt_body
+    from db.models import Email
+
+    rows = db.query(Email.id, Email.sender, Email.subject, Email.masked_text, Email.category, Email.urgency).filter(
+        Email.is_processed == True,
+        Email.masked_text.isnot(None),
+        Email.category.isnot(None),
+        Email.category.notin_(UNTRAINABLE_CATEGORIES),
+        # Rows from before classified_by existed were all labelled by the LLM
+        (Email.classified_by == "llm") | Email.classified_by.is_(None),
+    ).all()
+    return [(r.id, r.sender, r.subject, decrypt_body(r.masked_text), r.category, r.urgency) for r in rows]
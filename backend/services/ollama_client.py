@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import httpx
+from config import settings
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for the local model server.
+    The limit grows by one per round of fast, fully used requests and halves when latency
+    climbs well above the best recently observed latency (queueing on the server) or a request fails
+    """
+    def __init__(self, initial: int, minimum: int, maximum: int, tolerance: float, backoff: float = 0.5, window: int = 500):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.baseline = None
+        self.window = window
+        self._window_min = None
+        self._window_samples = 0
+        self._last_decrease = 0.0
+        self._condition = None
+
+    async def acquire(self):
+        # The condition is bound to the running loop, so create it there
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, ok: bool):
+        async with self._condition:
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self._update(latency, ok, saturated)
+            self._condition.notify_all()
+
+    def _update(self, latency: float, ok: bool, saturated: bool):
+        if ok:
+            self.baseline = latency if self.baseline is None else min(latency, self.baseline)
+
+            # Every window, restart the baseline from that window's best latency so it follows changes in model or prompt size
+            self._window_min = latency if self._window_min is None else min(latency, self._window_min)
+            self._window_samples += 1
+            if self._window_samples >= self.window:
+                self.baseline, self._window_min, self._window_samples = self._window_min, None, 0
+
+        if not ok or self.baseline is None or latency > self.baseline * self.tolerance:
+            # Back off at most once per baseline round trip, so one burst of slow replies counts once
+            now = time.monotonic()
+            if now - self._last_decrease >= (self.baseline or 0):
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._last_decrease = now
+        elif saturated:
+            # Only grow when the current limit is actually in use
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def snapshot(self) -> dict:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "baseline_ms": round((self.baseline or 0) * 1000)}
+
+class OllamaClient:
+    """
+    Async client for the Ollama generate API with one keep-alive connection pool
+    """
+    def __init__(self, base_url: str, model: str, timeout: float, transport=None):
+        self.model = model
+        self.limiter = AdaptiveLimiter(
+            initial=settings.OLLAMA_INITIAL_CONCURRENCY,
+            minimum=settings.OLLAMA_MIN_CONCURRENCY,
+            maximum=settings.OLLAMA_MAX_CONCURRENCY,
+            tolerance=settings.OLLAMA_LATENCY_TOLERANCE,
+        )
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONCURRENCY,
+                max_keepalive_connections=settings.OLLAMA_MAX_CONCURRENCY,
+            ),
+        )
+
+    async def generate(self, prompt: str):
+        """
+        Runs one JSON-mode generation. Returns the raw response text and the request time in seconds,
+        not counting time spent waiting for a concurrency slot
+        """
+        await self.limiter.acquire()
+        start = time.monotonic()
+        ok = False
+        try:
+            response = await self._http.post("/api/generate", json={
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "format": "json",
+                "keep_alive": "1h"
+            })
+            response.raise_for_status()
+            ok = True
+            return response.json()["response"], time.monotonic() - start
+        finally:
+            await self.limiter.release(time.monotonic() - start, ok)
+
+    async def aclose(self):
+        await self._http.aclose()
+
+# Celery tasks are synchronous, so requests run on one event loop in a background thread.
+# Loop and client are per process: a forked worker starts its own instead of inheriting the parent's
+_loop = None
+_client = None
+_owner_pid = None
+_lock = threading.Lock()
+
+def _start():
+    global _loop, _client, _owner_pid
+    with _lock:
+        if _loop is not None and _owner_pid == os.getpid():
+            return
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="ollama-client", daemon=True).start()
+        _client = OllamaClient(settings.OLLAMA_URL, settings.OLLAMA_MODEL, settings.OLLAMA_TIMEOUT_SECONDS)
+        _loop, _owner_pid = loop, os.getpid()
+
+def get_client() -> OllamaClient:
+    """
+    Returns this process's shared client, starting its event loop on first use
+    """
+    _start()
+    return _client
+
+def run(coroutine):
+    """
+    Runs a coroutine on the background loop and waits for its result
+    """
+    _start()
+    return asyncio.run_coroutine_threadsafe(coroutine, _loop).result()
+
+def generate_many(prompts: list, parse) -> list:
+    """
+    Sends every prompt concurrently under the adaptive limit.
+    Returns a list of (parse(response) or the exception, request ms) in prompt order
+    """
+    if not prompts:
+        return []
+    client = get_client()
+
+    async def one(prompt):
+        try:
+            raw_response, seconds = await client.generate(prompt)
+            return parse(raw_response), seconds * 1000
+        except Exception as e:
+            return e, 0
+
+    async def gather():
+        return await asyncio.gather(*(one(prompt) for prompt in prompts))
+
+    results = run(gather())
+    logging.info(f"Ollama limiter: {client.limiter.snapshot()}")
+    return results
@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+
+# Marks the end of the stream as it passes from stage to stage
+_DONE = object()
+
+class StageStats:
+    """
+    Work counters for one pipeline stage
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self, wall_seconds: float) -> dict:
+        return {
+            "items": self.items,
+            "busy_s": round(self.busy_seconds, 2),
+            "utilization": round(self.busy_seconds / wall_seconds, 2) if wall_seconds else 0.0,
+        }
+
+class Pipeline:
+    """
+    Runs a source and a chain of stages on their own threads, linked by bounded queues,
+    so each stage works on the next item while later stages handle the previous one.
+    The first exception stops every stage and is re-raised from run()
+    """
+    def __init__(self, stages: list, queue_size: int = 2):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = {name: StageStats(name) for name in ["source"] + [name for name, _ in stages]}
+        self.wall_seconds = 0.0
+        self._stop = threading.Event()
+        self._error = None
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        # Time out regularly so a stopped pipeline never leaves a thread blocked on a full queue
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, exception: Exception):
+        if self._error is None:
+            self._error = exception
+        self._stop.set()
+
+    def _run_source(self, source, out_q: queue.Queue):
+        stats = self.stats["source"]
+        try:
+            iterator = iter(source)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                item = next(iterator, _DONE)
+                stats.busy_seconds += time.perf_counter() - start
+                if item is _DONE:
+                    break
+                stats.items += 1
+                if not self._put(out_q, item):
+                    return
+        except Exception as e:
+            self._fail(e)
+        self._put(out_q, _DONE)
+
+    def _run_stage(self, name: str, fn, in_q: queue.Queue, out_q):
+        stats = self.stats[name]
+        while True:
+            item = self._get(in_q)
+            if item is _DONE:
+                break
+            try:
+                start = time.perf_counter()
+                result = fn(item)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.items += 1
+            except Exception as e:
+                self._fail(e)
+                break
+            if out_q is not None and not self._put(out_q, result):
+                break
+        if out_q is not None:
+            self._put(out_q, _DONE)
+
+    def run(self, source):
+        """
+        Feeds every item from source through the stages and waits for the last one to finish
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(source, queues[0]), name="pipeline-source", daemon=True)]
+        for index, (name, fn) in enumerate(self.stages):
+            out_q = queues[index + 1] if index + 1 < len(queues) else None
+            threads.append(threading.Thread(target=self._run_stage, args=(name, fn, queues[index], out_q), name=f"pipeline-{name}", daemon=True))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - start
+
+        if self._error is not None:
+            raise self._error
+
+    def report(self) -> dict:
+        """
+        Per-stage items, busy time and utilization over the pipeline's wall time
+        """
+        return {name: stats.as_dict(self.wall_seconds) for name, stats in self.stats.items()}
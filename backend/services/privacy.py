@@ -1,6 +1,11 @@
+import hashlib
+import json
 import logging
-from presidio_analyzer import AnalyzerEngine
-from presidio_analyzer.nlp_engine import NlpEngineProvider
+import re
+import threading
+import time
+from collections import namedtuple
+from config import settings
 
 logging.getLogger("presidio-analyzer").setLevel(logging.ERROR)
 
@@ -9,11 +14,219 @@ nlp_config = {
     "nlp_engine_name": "spacy",
     "models": [{"lang_code": "en", "model_name": "en_core_web_sm"}],
 }
-provider = NlpEngineProvider(nlp_configuration=nlp_config)
-nlp_engine = provider.create_engine()
 
-# Initialize Presidio Analyzer
-analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["en"])
+# Presidio and the spaCy model are loaded on first use, so processes that never mask skip the cost
+_analyzer = None
+_batch_analyzer = None
+
+def get_analyzer():
+    '''
+    Returns the shared Presidio analyzer, loading the spaCy model the first time it's needed
+    '''
+    global _analyzer
+    if _analyzer is None:
+        from presidio_analyzer import AnalyzerEngine
+        from presidio_analyzer.nlp_engine import NlpEngineProvider
+
+        provider = NlpEngineProvider(nlp_configuration=nlp_config)
+        nlp_engine = provider.create_engine()
+
+        # Initialize Presidio Analyzer
+        _analyzer = AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["en"])
+    return _analyzer
+
+def get_batch_analyzer():
+    '''
+    Returns a batch analyzer that wraps the shared analyzer
+    '''
+    global _batch_analyzer
+    if _batch_analyzer is None:
+        from presidio_analyzer import BatchAnalyzerEngine
+        _batch_analyzer = BatchAnalyzerEngine(analyzer_engine=get_analyzer())
+    return _batch_analyzer
+
+# Entity types replaced with placeholders
+MASKED_ENTITIES = ["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"]
+
+# Masking tiers: "regex" only runs the compiled patterns, "tiered" runs NER only when the text has a
+# capitalized word that could be a name, and "ner" runs Presidio on everything
+MASKING_TIERS = ("regex", "tiered", "ner")
+
+# Emails and phone numbers are caught in one compiled pass
+FAST_PATTERN = re.compile(
+    r"(?P<EMAIL_ADDRESS>[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,})"
+    r"|(?P<PHONE_NUMBER>(?<![\w+])(?:\+?\d{1,3}[\s.-]?)?(?:\(\d{3}\)|\d{3})[\s.-]?\d{3}[\s.-]?\d{4}(?!\w))"
+)
+
+# Capitalized words, which may be person names. Acronyms and placeholder types have no lowercase letters and are ignored
+CAPITALIZED_PATTERN = re.compile(r"\b[A-Z][\w'’-]*")
+SENTENCE_END = re.compile(r"(?:^|[.!?:;\n])[\s\"'(“]*$")
+
+# Common words that start sentences and are never names on their own. Any other capitalized word sends the text to NER,
+# so a name that opens a sentence ("Sarah asked...") or the text ("John Smith wrote...") is still caught
+SENTENCE_START_WORDS = {
+    "A", "An", "The", "This", "That", "These", "Those", "There", "Here", "It", "Its", "We", "You", "He", "She", "They",
+    "My", "Our", "Your", "His", "Her", "Their", "Please", "Thanks", "Thank", "Hi", "Hello", "Hey", "Dear", "Yes", "No",
+    "Ok", "Okay", "If", "When", "What", "Where", "Why", "How", "Who", "Which", "Can", "Could", "Would", "Should", "Will",
+    "Just", "Also", "And", "But", "So", "Or", "For", "To", "In", "On", "At", "As", "By", "With", "From", "Of", "Let",
+    "Sorry", "Great", "Sure", "Best", "Regards", "Cheers", "Sincerely", "Kind", "Looking", "Attached", "See", "Do",
+    "Does", "Did", "Is", "Are", "Was", "Were", "Have", "Has", "Had", "Not", "All", "Any", "Some", "Each", "Every",
+    "After", "Before", "Once", "Since", "While", "Now", "Today", "Tomorrow", "Yesterday", "However", "Unfortunately",
+    "Hope", "Good", "Morning", "Afternoon", "Evening", "Click", "View", "Get", "Re", "Fwd", "Fw", "Subject", "Sent",
+    "Date", "Note", "I'm", "I'll", "I've", "I'd", "It's", "That's", "There's", "Here's", "We're", "We'll", "You're",
+    "Don't", "Let's", "Call", "Send", "Ask", "Check", "Find", "Make", "Take", "Follow", "Reply", "Join", "Read",
+}
+
+# Capitalized words that are never names mid-sentence either. Months that double as names are left out
+STOPWORDS = {
+    "I'm", "I'll", "I've", "I'd", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+    "January", "February", "March", "July", "September", "October", "November", "December", "Re", "Fwd", "Fw",
+}
+
+# Placeholders already in the text, which NER results must not overlap
+PLACEHOLDER_PATTERN = re.compile(r"<[A-Z_]+_\d+>")
+
+Span = namedtuple("Span", ["start", "end", "entity_type"])
+
+class MaskingStats:
+    '''
+    Thread-safe counters for how often each masking tier runs, what it finds, and how long it takes
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.texts = 0
+            self.regex_hits = 0
+            self.regex_seconds = 0.0
+            self.ner_runs = 0
+            self.ner_skipped = 0
+            self.ner_hits = 0
+            self.ner_seconds = 0.0
+
+    def record(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "texts": self.texts,
+                "regex_hits": self.regex_hits,
+                "regex_ms_per_text": 1000 * self.regex_seconds / self.texts if self.texts else 0.0,
+                "ner_runs": self.ner_runs,
+                "ner_skip_rate": self.ner_skipped / self.texts if self.texts else 0.0,
+                "ner_hits": self.ner_hits,
+                "ner_ms_per_run": 1000 * self.ner_seconds / self.ner_runs if self.ner_runs else 0.0,
+            }
+
+masking_stats = MaskingStats()
+
+def get_masking_stats() -> dict:
+    '''
+    Returns per-tier hit counts, NER skip rate, and timings since the process started
+    '''
+    return masking_stats.snapshot()
+
+def masking_fingerprint() -> str:
+    '''
+    Identifies the masking configuration, so cached masked text is invalidated when it changes
+    '''
+    config = {"nlp": nlp_config, "entities": MASKED_ENTITIES, "tier": settings.MASKING_TIER}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+def _merge_overlaps(results: list) -> list:
+    '''
+    Sorts results by position and merges overlapping ones into a single span,
+    labelled with the highest scoring (then longest) entity type
+    '''
+    merged = []
+    for res in sorted(results, key=lambda r: (r.start, -(r.end - r.start))):
+        rank = (getattr(res, "score", 1.0), res.end - res.start)
+        if merged and res.start < merged[-1][1]:
+            start, end, entity_type, best_rank = merged[-1]
+            if rank > best_rank:
+                entity_type, best_rank = res.entity_type, rank
+            merged[-1] = (start, max(end, res.end), entity_type, best_rank)
+        else:
+            merged.append((res.start, res.end, res.entity_type, rank))
+    return [Span(start, end, entity_type) for start, end, entity_type, _ in merged]
+
+def _apply_mask(text: str, results: list, pii_map: dict = None):
+    '''
+    Replace analyzer results with placeholders and create a mapping of placeholders to original values.
+    Overlapping results are merged, the masked text is assembled in a single pass,
+    and repeated values reuse the same placeholder. An existing pii_map is extended
+    '''
+    pii_map = dict(pii_map or {})
+
+    # Reuse placeholders already handed out, and keep numbering each entity type from where it left off
+    placeholders = {}
+    counters = {}
+    for placeholder, value in pii_map.items():
+        entity_type, index = placeholder[1:-1].rsplit("_", 1)
+        placeholders[(entity_type, value)] = placeholder
+        counters[entity_type] = max(counters.get(entity_type, 0), int(index))
+
+    pieces = []
+    position = 0
+    for span in _merge_overlaps(results):
+        original_value = text[span.start:span.end]
+        key = (span.entity_type, original_value)
+        if key not in placeholders:
+            counters[span.entity_type] = counters.get(span.entity_type, 0) + 1
+            placeholders[key] = f"<{span.entity_type}_{counters[span.entity_type]}>"
+            pii_map[placeholders[key]] = original_value
+
+        pieces.append(text[position:span.start])
+        pieces.append(placeholders[key])
+        position = span.end
+    pieces.append(text[position:])
+
+    return "".join(pieces), pii_map
+
+def _regex_tier(text: str):
+    '''
+    Masks emails and phone numbers with the compiled fast pattern
+    '''
+    start = time.perf_counter()
+    spans = [Span(m.start(), m.end(), m.lastgroup) for m in FAST_PATTERN.finditer(text)]
+    masked = _apply_mask(text, spans)
+    masking_stats.record(texts=1, regex_hits=len(spans), regex_seconds=time.perf_counter() - start)
+    return masked
+
+def _needs_ner(text: str) -> bool:
+    '''
+    Decides whether a text goes on to the NER tier. In the tiered mode only texts without a single
+    capitalized word that could be a name skip it
+    '''
+    if settings.MASKING_TIER == "ner":
+        return True
+    if settings.MASKING_TIER == "regex":
+        return False
+    for match in CAPITALIZED_PATTERN.finditer(text):
+        word = match.group(0)
+        if word == word.upper() or word in STOPWORDS:
+            continue
+        sentence_initial = SENTENCE_END.search(text, max(0, match.start() - 8), match.start()) is not None
+        if not sentence_initial or word not in SENTENCE_START_WORDS:
+            return True
+    return False
+
+def _merge_ner(text: str, pii_map: dict, results: list):
+    '''
+    Masks NER results on top of the regex tier's output, skipping anything inside an existing placeholder
+    '''
+    placeholders = [m.span() for m in PLACEHOLDER_PATTERN.finditer(text)]
+    results = [
+        res for res in results
+        if not any(res.start < end and start < res.end for start, end in placeholders)
+    ]
+    masking_stats.record(ner_hits=len(results))
+    return _apply_mask(text, results, pii_map)
 
 def mask_content(text: str):
     '''
@@ -21,33 +234,53 @@ def mask_content(text: str):
     '''
     if not text:
         return "", {}
+
+    # Fast path: emails and phone numbers
+    masked_text, pii_map = _regex_tier(text)
+    if not _needs_ner(masked_text):
+        masking_stats.record(ner_skipped=1)
+        return masked_text, pii_map
     
     # Analyze text to find PII entities
-    results = analyzer.analyze(text=text, entities=["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"], language='en')
-    pii_map = {}
-    
-    # Sort results in reverse order to avoid messing up indices when replacing
-    sorted_results = sorted(results, key=lambda x: x.start, reverse=True)
-    temp_text = text
-    
-    # Replace each detected entity with a placeholder and store the mapping
-    for i, res in enumerate(sorted_results):
-        original_value = text[res.start:res.end]
-        placeholder = f"<{res.entity_type}_{i}>"
-        pii_map[placeholder] = original_value
-        
-        # Replace the original value with the placeholder in the text
-        temp_text = temp_text[:res.start] + placeholder + temp_text[res.end:]
+    start = time.perf_counter()
+    results = get_analyzer().analyze(text=masked_text, entities=MASKED_ENTITIES, language='en')
+    masking_stats.record(ner_runs=1, ner_seconds=time.perf_counter() - start)
+    return _merge_ner(masked_text, pii_map, results)
 
-    return temp_text, pii_map
+def mask_batch(texts: list, batch_size: int = None, n_process: int = None) -> list:
+    '''
+    Mask PII in a whole batch of texts, letting spaCy process the documents together via nlp.pipe.
+    Returns a (masked_text, pii_map) pair per input text, in order
+    '''
+    masked = [_regex_tier(text) if text else ("", {}) for text in texts]
+
+    # Only texts that still look like they contain names go through NER
+    indexes = [i for i, text in enumerate(texts) if text and _needs_ner(masked[i][0])]
+    masking_stats.record(ner_skipped=sum(1 for text in texts if text) - len(indexes))
+    if not indexes:
+        return masked
+
+    start = time.perf_counter()
+    batch_results = get_batch_analyzer().analyze_iterator(
+        [masked[i][0] for i in indexes],
+        language='en',
+        batch_size=batch_size or settings.MASK_BATCH_SIZE,
+        n_process=n_process or settings.MASK_N_PROCESS,
+        entities=MASKED_ENTITIES
+    )
+    masking_stats.record(ner_runs=len(indexes), ner_seconds=time.perf_counter() - start)
+
+    for i, results in zip(indexes, batch_results):
+        masked[i] = _merge_ner(masked[i][0], masked[i][1], results)
+    return masked
 
 def deanonymize_text(text: str, pii_map: dict) -> str:
     '''
-    Unmask PII in the text
+    Unmask PII in the text with a single pass over a compiled alternation of the placeholders
     '''
     if not text or not pii_map:
         return text
-    
-    for placeholder, real_value in pii_map.items():
-        text = text.replace(placeholder, real_value)
-    return text
\ No newline at end of file
+
+    # Longest placeholders first, so e.g. <PERSON_10> is never matched as <PERSON_1>
+    pattern = re.compile("|".join(re.escape(p) for p in sorted(pii_map, key=len, reverse=True)))
+    return pattern.sub(lambda match: pii_map[match.group(0)], text)
\ No newline at end of file
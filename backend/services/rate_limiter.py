@@ -0,0 +1,101 @@
+import redis
+from config import settings
+from db.redis_client import get_redis
+
+# Refills both buckets for the time since their last use, then reserves the request if it can start within
+# max_wait. Levels may go negative: later callers then wait behind earlier reservations, first come first served.
+# KEYS: request bucket, token bucket. ARGV: rpm, tpm, requests, tokens, max_wait, reserve (1/0)
+RESERVE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+
+local function refill(key, capacity)
+    local state = redis.call('HMGET', key, 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, level + (now - ts) * capacity / 60)
+end
+
+local rpm, tpm = tonumber(ARGV[1]), tonumber(ARGV[2])
+local requests, tokens = tonumber(ARGV[3]), tonumber(ARGV[4])
+local request_level = refill(KEYS[1], rpm)
+local token_level = refill(KEYS[2], tpm)
+
+-- A request larger than a whole bucket waits for the bucket to fill
+local wait = math.max(0,
+    (math.min(requests, rpm) - request_level) * 60 / rpm,
+    (math.min(tokens, tpm) - token_level) * 60 / tpm)
+
+if ARGV[6] == '1' and wait <= tonumber(ARGV[5]) then
+    request_level = request_level - requests
+    token_level = token_level - tokens
+end
+
+redis.call('HSET', KEYS[1], 'level', tostring(request_level), 'ts', tostring(now))
+redis.call('HSET', KEYS[2], 'level', tostring(token_level), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 120)
+redis.call('EXPIRE', KEYS[2], 120)
+return tostring(wait)
+"""
+
+class RateLimited(Exception):
+    """
+    Raised when a call cannot start within the caller's maximum wait
+    """
+    def __init__(self, wait_seconds: float):
+        super().__init__(f"Rate limited for {wait_seconds:.1f}s")
+        self.wait_seconds = wait_seconds
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets in Redis, shared by every worker
+    """
+    def __init__(self, name: str, rpm: int, tpm: int):
+        self.keys = [f"ratelimit:{name}:requests", f"ratelimit:{name}:tokens"]
+        self.rpm = rpm
+        self.tpm = tpm
+        self._script = None
+
+    def _call(self, tokens: int, max_wait: float, reserve: bool) -> float:
+        if self._script is None:
+            self._script = get_redis().register_script(RESERVE_SCRIPT)
+        return float(self._script(keys=self.keys, args=[self.rpm, self.tpm, 1, tokens, max_wait, 1 if reserve else 0]))
+
+    def reserve(self, tokens: int, max_wait: float = 0) -> float:
+        """
+        Reserves one request and its tokens, returning how long to sleep before sending.
+        Raises RateLimited, without reserving, when that would exceed max_wait.
+        If Redis is unreachable the call goes ahead, leaving quota errors to the task's retry
+        """
+        try:
+            wait = self._call(tokens, max_wait, reserve=True)
+        except redis.RedisError as e:
+            print(f"Rate limiter error: {e}")
+            return 0.0
+        if wait > max_wait:
+            raise RateLimited(wait)
+        return wait
+
+    def wait_time(self, tokens: int = 0) -> float:
+        """
+        Seconds until a request of this size could start, without reserving anything
+        """
+        try:
+            return self._call(tokens, 0, reserve=False)
+        except redis.RedisError as e:
+            print(f"Rate limiter error: {e}")
+            return 0.0
+
+    def adjust(self, tokens: int):
+        """
+        Corrects the token bucket once a response reports its real usage; positive tokens were under-reserved
+        """
+        try:
+            # A bucket that expired in the meantime is full again, so there is nothing to correct
+            r = get_redis()
+            if r.hexists(self.keys[1], "level"):
+                r.hincrbyfloat(self.keys[1], "level", -tokens)
+        except redis.RedisError as e:
+            print(f"Rate limiter error: {e}")
+
+gemini_limiter = TokenBucketLimiter("gemini", settings.GEMINI_RPM, settings.GEMINI_TPM)
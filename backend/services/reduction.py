@@ -0,0 +1,121 @@
+import re
+import threading
+from services.tokens import estimate_tokens
+
+# Markers that start the quoted history of a reply, in text where the HTML structure is gone or never existed
+REPLY_MARKERS = re.compile(
+    r"(?:^|\s)On\s[^\n]{1,200}?\swrote:"
+    r"|-{2,}\s*Original Message\s*-{2,}"
+    r"|_{10,}\s*From:"
+    r"|(?:^|\s)From:\s[^\n]{1,200}?\sSent:\s",
+    re.IGNORECASE,
+)
+
+# Signature delimiter ("-- " on its own line) and mobile signatures
+SIGNATURE_DELIMITER = re.compile(r"^--\s*$", re.MULTILINE)
+MOBILE_SIGNATURE = re.compile(r"^\s*Sent from my [\w\s]{1,30}$|(?:^|\s)Sent from my (?:iPhone|iPad|Android|Samsung|BlackBerry)\b", re.IGNORECASE | re.MULTILINE)
+
+# Sentences that are legal or list-management boilerplate rather than message content
+FOOTER_PATTERN = re.compile(
+    r"unsubscribe|view (?:this|it) (?:email )?in (?:your|a) browser|you (?:are|were) receiving this"
+    r"|manage (?:your )?(?:email )?(?:preferences|subscriptions?)|update your (?:email )?preferences"
+    r"|no longer wish to receive|privacy policy|all rights reserved|©|\(c\) \d{4}"
+    r"|this (?:e-?mail|message)(?: and any attachments)? (?:is|are|may be|may contain) (?:strictly )?(?:confidential|privileged)"
+    r"|intended (?:solely |only )?for the (?:use of the )?(?:named )?(?:individual|recipient|addressee)",
+    re.IGNORECASE,
+)
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+URL_PATTERN = re.compile(r"https?://([^/\s]+)\S*")
+
+# Tracking links collapse to their host once they are longer than this
+MAX_URL_CHARS = 40
+
+# A reply marker only counts when this much new text comes before it, so pure forwards keep their content
+MIN_NOVEL_CHARS = 20
+
+def _shorten_url(match) -> str:
+    return match.group(0) if len(match.group(0)) <= MAX_URL_CHARS else f"[link: {match.group(1)}]"
+
+def reduce_text(text: str) -> str:
+    """
+    Keeps the novel part of an email: drops quoted reply history, signatures, footer boilerplate,
+    repeated sentences, and the long tails of tracking links
+    """
+    if not text:
+        return text
+
+    # Everything after the first reply marker is quoted history
+    for match in REPLY_MARKERS.finditer(text):
+        if len(text[:match.start()].strip()) >= MIN_NOVEL_CHARS:
+            text = text[:match.start()]
+            break
+
+    delimiter = SIGNATURE_DELIMITER.search(text)
+    if delimiter and len(text[:delimiter.start()].strip()) >= MIN_NOVEL_CHARS:
+        text = text[:delimiter.start()]
+    text = MOBILE_SIGNATURE.sub("", text)
+    text = URL_PATTERN.sub(_shorten_url, text)
+
+    # Work line by line (HTML blocks arrive as lines) so layout survives; quoted lines, footers and repeats are dropped
+    kept_lines = []
+    seen = set()
+    for line in text.splitlines():
+        if line.lstrip().startswith(">"):
+            continue
+        sentences = []
+        for sentence in SENTENCE_PATTERN.split(line):
+            # Footer boilerplate is cut from where it starts, keeping real content before it in the same sentence
+            footer = FOOTER_PATTERN.search(sentence)
+            if footer:
+                sentence = sentence[:footer.start()]
+                if len(sentence.strip()) < MIN_NOVEL_CHARS:
+                    continue
+            key = " ".join(sentence.lower().split())
+            if not key or (len(key) > 20 and key in seen):
+                continue
+            seen.add(key)
+            sentences.append(sentence.strip())
+        if sentences:
+            kept_lines.append(" ".join(sentences))
+    return "\n".join(kept_lines)
+
+class ReductionStats:
+    """
+    Thread-safe running token counts before and after content reduction, as they reach the prompt
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.emails = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, before: str, after: str) -> int:
+        """
+        Counts one email and returns the tokens saved on it
+        """
+        tokens_before, tokens_after = estimate_tokens(before), estimate_tokens(after)
+        with self._lock:
+            self.emails += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+        return tokens_before - tokens_after
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "emails": self.emails,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "saved_per_email": round(saved / self.emails, 1) if self.emails else 0.0,
+                "saved_ratio": round(saved / self.tokens_before, 3) if self.tokens_before else 0.0,
+            }
+
+reduction_stats = ReductionStats()
+
+def get_reduction_stats() -> dict:
+    """
+    Returns token counts and savings since the process started
+    """
+    return reduction_stats.snapshot()
@@ -0,0 +1,99 @@
+import json
+import os
+import re
+from email.utils import parseaddr
+from config import settings
+
+# Supported conditions. Every condition in a rule's "when" must hold; the first matching rule wins.
+#   labels_any:      the email has at least one of these Gmail labels
+#   headers_present: at least one of these headers (lowercase) was sent
+#   header_matches:  {header: regex}, every header is present and matches
+#   sender_matches:  regex against the sender address
+#   sender_domains:  the sender address is at one of these domains or their subdomains
+#   subject_matches: regex against the subject
+# "skip_when" takes the same conditions and sends matching emails to the models regardless of the rules
+
+class Rule:
+    """
+    One named rule: a set of conditions and the category and urgency it assigns
+    """
+    def __init__(self, spec: dict):
+        self.name = spec["name"]
+        self.category = spec["category"]
+        self.urgency = str(spec["urgency"])
+        self.conditions = _compile(spec["when"])
+
+    def matches(self, email_record) -> bool:
+        return _matches(self.conditions, email_record)
+
+def _compile(when: dict) -> dict:
+    conditions = dict(when)
+    for key in ("sender_matches", "subject_matches"):
+        if key in conditions:
+            conditions[key] = re.compile(conditions[key], re.IGNORECASE)
+    if "header_matches" in conditions:
+        conditions["header_matches"] = {name.lower(): re.compile(pattern, re.IGNORECASE) for name, pattern in conditions["header_matches"].items()}
+    if "sender_domains" in conditions:
+        conditions["sender_domains"] = [domain.lower() for domain in conditions["sender_domains"]]
+    return conditions
+
+def _matches(conditions: dict, email_record) -> bool:
+    labels = set(email_record.label_ids or [])
+    headers = email_record.headers or {}
+    address = parseaddr(email_record.sender or "")[1].lower()
+    domain = address.rpartition("@")[2]
+
+    for key, expected in conditions.items():
+        if key == "labels_any" and not labels.intersection(expected):
+            return False
+        if key == "headers_present" and not any(name.lower() in headers for name in expected):
+            return False
+        if key == "header_matches" and not all(name in headers and pattern.search(headers[name].strip()) for name, pattern in expected.items()):
+            return False
+        if key == "sender_matches" and not expected.search(address):
+            return False
+        if key == "sender_domains" and not any(domain == d or domain.endswith("." + d) for d in expected):
+            return False
+        if key == "subject_matches" and not expected.search(email_record.subject or ""):
+            return False
+    return True
+
+# Rules are reloaded whenever the file changes, so edits apply without restarting workers
+_rules = None
+_skip_when = None
+_loaded_mtime = None
+
+def load_rules() -> list:
+    """
+    Returns the compiled rules from CLASSIFICATION_RULES_PATH, or an empty list if the file is missing or invalid
+    """
+    global _rules, _skip_when, _loaded_mtime
+    try:
+        mtime = os.path.getmtime(settings.CLASSIFICATION_RULES_PATH)
+    except OSError:
+        _rules, _skip_when, _loaded_mtime = [], {}, None
+        return _rules
+
+    if mtime != _loaded_mtime:
+        try:
+            with open(settings.CLASSIFICATION_RULES_PATH) as f:
+                spec = json.load(f)
+            _rules = [Rule(rule) for rule in spec.get("rules", [])]
+            _skip_when = _compile(spec.get("skip_when", {}))
+        except (ValueError, KeyError, re.error) as e:
+            print(f"Classification rules error: {e}")
+            _rules, _skip_when = [], {}
+        _loaded_mtime = mtime
+    return _rules
+
+def classify(email_record):
+    """
+    Returns (rule name, {"category", "urgency"}) for the first matching rule, or None
+    """
+    rules = load_rules()
+    if not rules or (_skip_when and _matches(_skip_when, email_record)):
+        return None
+    for rule in rules:
+        if rule.matches(email_record):
+            return rule.name, {"category": rule.category, "urgency": rule.urgency}
+    return None
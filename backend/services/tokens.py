@@ -0,0 +1,27 @@
+import re
+
+# Words, numbers and single punctuation marks. Subword tokenizers split long words,
+# so a piece counts as one token per CHARS_PER_TOKEN characters
+PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local estimate of a model's token count, without loading a tokenizer
+    """
+    if not text:
+        return 0
+    return sum(-(-len(piece) // CHARS_PER_TOKEN) for piece in PIECE_PATTERN.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts text after the last whole piece that fits in max_tokens by estimate_tokens
+    """
+    total = 0
+    end = 0
+    for match in PIECE_PATTERN.finditer(text or ""):
+        total += -(-len(match.group()) // CHARS_PER_TOKEN)
+        if total > max_tokens:
+            return text[:end]
+        end = match.end()
+    return text
@@ -3,12 +3,17 @@ from sqlalchemy.orm import Session
 from db.models import User
 from authent.encryption import encrypt_token
 
-def create_or_update_user(db: Session, email: str, name: str, google_sub: str, access_token: str, refresh_token: str = None) -> User:
+def create_or_update_user(db: Session, email: str, name: str, google_sub: str, access_token: str, refresh_token: str = None, expires_at: int = None) -> User:
     """
     Creates a new user or updates an existing user's tokens
     """
     user = db.query(User).filter(User.email == email).first()
 
+    # Store the token expiry as naive UTC so the background refresher can find tokens about to expire
+    token_expires_at = None
+    if expires_at:
+        token_expires_at = datetime.fromtimestamp(expires_at, tz=timezone.utc).replace(tzinfo=None)
+
     # If user doesn't exist, create new entry. If user exists, update tokens
     if not user:
         user = User(
@@ -17,11 +22,13 @@ def create_or_update_user(db: Session, email: str, name: str, google_sub: str, a
             created_at=datetime.now(timezone.utc),
             google_sub=encrypt_token(google_sub),
             encrypted_access_token=encrypt_token(access_token),
-            encrypted_refresh_token=encrypt_token(refresh_token) if refresh_token else None
+            encrypted_refresh_token=encrypt_token(refresh_token) if refresh_token else None,
+            token_expires_at=token_expires_at
         )
         db.add(user)
     else:
         user.encrypted_access_token = encrypt_token(access_token)
+        user.token_expires_at = token_expires_at
         if refresh_token:
             user.encrypted_refresh_token = encrypt_token(refresh_token)
     
@@ -1,18 +1,15 @@
-import os
-from celery import Celery
-from services.email_service import fetch_and_store_emails
+from celery_app import celery_app
+from services.email_service import fetch_and_store_emails, backfill_emails, fetch_pending_bodies, reencode_legacy_bodies
 from db.database import Session
+from db.redis_client import get_redis
 from db.models import User, Email
-from services.ai_service import classify_and_summarize_batch
-from google.api_core import exceptions
+from authent.token_service import refresh_expiring_tokens
+from services.ai_pipeline import run_ai_pipeline
+from services.ai_service import preprocess_batch, summarize_batch, gemini_breaker
+from services.rate_limiter import gemini_limiter
+from redis.exceptions import LockError
 from datetime import datetime, timezone
-
-# Initialize Celery
-celery_app = Celery(
-    "email_ing",
-    broker=os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0"),
-    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
-)
+from config import settings
 
 @celery_app.task(name="sync_user_emails")
 def sync_user_emails(user_id: int):
@@ -30,53 +27,201 @@ def sync_user_emails(user_id: int):
         
         fetch_and_store_emails(db, user)
         process_emails_with_ai.delay(user_id)
+        start_body_fetch(user_id)
+
+        # Ingest the rest of the mailbox in the background until the backfill completes.
+        # The chain re-enqueues itself, so only start one when none is queued already
+        if not user.backfill_completed_at and get_redis().set(
+            f"backfill-chain:{user_id}", 1, nx=True, ex=settings.BACKFILL_LOCK_SECONDS * 2
+        ):
+            backfill_user_emails.delay(user_id)
         return f"Successfully synced emails for user {user_id}"
     finally:
         db.close()
 
+@celery_app.task(name="refresh_expiring_tokens")
+def refresh_expiring_tokens_task():
+    """
+    Refreshes OAuth tokens shortly before they expire
+    """
+    db = Session()
+    try:
+        refreshed = refresh_expiring_tokens(db)
+        return f"Refreshed {refreshed} tokens"
+    finally:
+        db.close()
+
+@celery_app.task(name="backfill_user_emails", bind=True, acks_late=True, max_retries=None)
+def backfill_user_emails(self, user_id: int):
+    """
+    Ingests a slice of the user's mailbox, then re-enqueues itself until the backfill completes
+    """
+    db = Session()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return "User not found"
+
+        # Only one backfill slice per user at a time. The lock expires on its own if the worker dies,
+        # and a blocked task (e.g. redelivered after a crash) waits for it instead of ending the chain
+        lock = get_redis().lock(f"backfill:{user_id}", timeout=settings.BACKFILL_LOCK_SECONDS)
+        if not lock.acquire(blocking=False):
+            raise self.retry(countdown=settings.BACKFILL_LOCK_SECONDS // 4)
+
+        # Extend the lock after every committed page, so long slices keep it
+        def keep_lock():
+            lock.extend(settings.BACKFILL_LOCK_SECONDS, replace_ttl=True)
+
+        # acks_late keeps the task queued if the worker dies, and the saved cursor makes the rerun resume
+        try:
+            completed = backfill_emails(db, user, max_pages=settings.BACKFILL_PAGES_PER_TASK, on_page=keep_lock)
+        except LockError:
+            return f"Backfill lock lost for user {user_id}"
+        finally:
+            try:
+                lock.release()
+            except LockError:
+                # The lock expired and another slice may hold it now
+                pass
+        process_emails_with_ai.delay(user_id)
+        start_body_fetch(user_id)
+
+        chain_key = f"backfill-chain:{user_id}"
+        if not completed:
+            get_redis().set(chain_key, 1, ex=settings.BACKFILL_LOCK_SECONDS * 2)
+            backfill_user_emails.delay(user_id)
+            return f"Backfill in progress for user {user_id}"
+        get_redis().delete(chain_key)
+        return f"Backfill complete for user {user_id}"
+    finally:
+        db.close()
+
+def start_body_fetch(user_id: int):
+    """
+    Starts a body-fetch chain for the user unless one is already running
+    """
+    if get_redis().set(f"body-fetch-chain:{user_id}", 1, nx=True, ex=settings.BODY_FETCH_CHAIN_SECONDS):
+        fetch_email_bodies_task.delay(user_id)
+
+@celery_app.task(name="fetch_email_bodies")
+def fetch_email_bodies_task(user_id: int, after: list = None):
+    """
+    Background stage that downloads full bodies for emails ingested metadata-first, one chunk per task
+    """
+    db = Session()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return "User not found"
+
+        fetched, cursor = fetch_pending_bodies(db, user, after=after)
+
+        # Continue from the cursor until every pending email was scanned. Emails Gmail could not return
+        # stay pending for the next chain instead of ending this one
+        chain_key = f"body-fetch-chain:{user_id}"
+        if cursor:
+            get_redis().set(chain_key, 1, ex=settings.BODY_FETCH_CHAIN_SECONDS)
+            fetch_email_bodies_task.delay(user_id, cursor)
+        else:
+            get_redis().delete(chain_key)
+        return f"Fetched {fetched} email bodies for user {user_id}"
+    finally:
+        db.close()
+
+@celery_app.task(name="reencode_email_bodies")
+def reencode_email_bodies(after_id: int = 0):
+    """
+    Migrates legacy Fernet email bodies to the compressed envelope, one chunk per task.
+    Start it with: celery -A tasks.celery_app call reencode_email_bodies
+    """
+    db = Session()
+    try:
+        last_id = reencode_legacy_bodies(db, after_id)
+        if last_id is None:
+            return "All email bodies use the compressed envelope."
+
+        reencode_email_bodies.delay(last_id)
+        return f"Re-encoded email bodies up to id {last_id}"
+    finally:
+        db.close()
+
 @celery_app.task(
     name="process_emails_with_ai",
     bind=True,
-    autoretry_for=(exceptions.ResourceExhausted,),
-    retry_backoff=60,
     max_retries=5
 )
-def process_emails_with_ai(self, user_id: int, max_email_count: int = 10):
+def process_emails_with_ai(self, user_id: int, max_email_count: int = None):
     """
     Fetch emails and generate AI content
     """
+    # Gemini requests are packed by token budget, so a task can take more emails than one request holds
+    max_email_count = max_email_count or settings.AI_BATCH_SIZE
+
+    # Wait for Gemini quota in the queue rather than preprocessing work that would sit idle
+    wait = gemini_limiter.wait_time()
+    if wait > settings.GEMINI_MAX_WAIT_SECONDS:
+        raise self.retry(countdown=wait)
+
+    # Only one pipeline per user, so no email is processed twice. The lock expires on its own if the worker dies
+    # A blocked task retries, since the running pipeline may have stopped reading before its emails arrived
+    lock = get_redis().lock(f"ai-pipeline:{user_id}", timeout=settings.AI_PIPELINE_LOCK_SECONDS)
+    if not lock.acquire(blocking=False):
+        raise self.retry(countdown=settings.AI_PIPELINE_RETRY_SECONDS)
+
+    try:
+        report = run_ai_pipeline(user_id, max_email_count, settings.AI_PIPELINE_MAX_BATCHES)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # The lock expired during a long run and the next run may hold it now
+            pass
+
+    # Summaries persisted before the quota ran out are kept; the retry picks up the rest
+    if report["postponed"]:
+        raise self.retry(countdown=max(gemini_limiter.wait_time(), settings.GEMINI_QUOTA_RETRY_SECONDS))
+
+    # Continue in a new task if the run stopped at its batch limit
+    if report["more"]:
+        process_emails_with_ai.delay(user_id, max_email_count)
+
+    if not report["emails"]:
+        return "No pending emails to process."
+    return f"Deep analysis complete for {report['emails']} emails ({report['emails_per_second']} emails/s)."
+
+@celery_app.task(name="resummarize_emails")
+def resummarize_emails():
+    """
+    Replaces local fallback summaries with Gemini summaries once the circuit breaker has closed
+    """
+    if not settings.GEMINI_RESUMMARIZE_ENABLED or gemini_breaker.state() != "closed":
+        return "Re-summarization skipped"
+
     db = Session()
     try:
-        records = db.query(Email).filter(
-            Email.user_id == user_id, 
-            Email.is_processed == False,
-        ).limit(max_email_count).all()
-        
-        # If no records, exit. Otherwise, process in batches of 10
+        records = db.query(Email).filter(Email.needs_resummary == True).order_by(Email.id).limit(settings.AI_BATCH_SIZE).all()
         if not records:
-            return "No pending emails to process."
+            return "No emails to re-summarize."
 
-        results = classify_and_summarize_batch(records)
-        results_map = {int(res['id']): res for res in results if res.get('id') is not None}
+        # Masked text comes from the preprocessing cache
+        prepared = preprocess_batch(records)
+        db.commit()
+        summaries = summarize_batch(records, prepared)
 
-        # Update email records with AI results
+        # Emails that fell back again, or were postponed by the quota, keep their flag for the next run
+        resummarized = 0
         for r in records:
-            if r.id in results_map:
-                data = results_map[r.id]
-                r.summary = data.get("summary", "")
-                r.category = data.get("category")
-                r.urgency = str(data.get("urgency"))
-                r.inference_time = data.get("inference_time")
-                r.is_processed = True
+            summary, _, fallback = summaries.get(r.id, (None, 0, True))
+            if not fallback:
+                r.summary = summary
+                r.needs_resummary = False
+                resummarized += 1
         db.commit()
 
-        # Trigger next batch if there are more unprocessed emails
-        if len(records) == max_email_count:
-            process_emails_with_ai.delay(user_id, max_email_count)
-
-        return f"Deep analysis complete for {len(records)} emails."
-    except Exception as e:
-        db.rollback()
-        raise e
+        if len(summaries) < len(records):
+            return f"Re-summarized {resummarized} emails, Gemini quota exhausted, the rest postponed"
+        if resummarized == settings.AI_BATCH_SIZE:
+            resummarize_emails.delay()
+        return f"Re-summarized {resummarized} emails"
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,71 @@
+import random
+import string
+
+import pytest
+
+from services.privacy import Span, _apply_mask, deanonymize_text
+
+ENTITY_TYPES = ["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"]
+
+
+def random_case(rng: random.Random, length: int, entities: int, overlap_rate: float):
+    '''
+    Builds a text and a list of spans over it. Names repeat, and some spans overlap
+    '''
+    names = ["".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(3, 10))) for _ in range(max(1, entities // 10))]
+    words = []
+    spans = []
+    position = 0
+    while position < length:
+        if len(spans) < entities and rng.random() < 0.3:
+            word = rng.choice(names)
+            spans.append(Span(position, position + len(word), rng.choice(ENTITY_TYPES)))
+            if rng.random() < overlap_rate:
+                spans.append(Span(position, position + rng.randint(1, len(word)), "PERSON"))
+        else:
+            word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 8)))
+        words.append(word)
+        position += len(word) + 1
+    return " ".join(words), spans
+
+
+def random_cases(count: int = 200):
+    rng = random.Random(0)
+    return [random_case(rng, rng.randint(0, 2000), rng.randint(0, 200), overlap_rate=0.3) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text, spans", random_cases())
+def test_round_trip_restores_text(text, spans):
+    masked, pii_map = _apply_mask(text, spans)
+    assert deanonymize_text(masked, pii_map) == text
+
+
+@pytest.mark.parametrize("text, spans", random_cases())
+def test_repeated_values_share_one_placeholder(text, spans):
+    masked, pii_map = _apply_mask(text, spans)
+    typed_values = {(placeholder.rsplit("_", 1)[0], value) for placeholder, value in pii_map.items()}
+    assert len(typed_values) == len(pii_map)
+    assert all(placeholder in masked for placeholder in pii_map)
+
+
+@pytest.mark.parametrize("text, spans", random_cases())
+def test_extending_a_map_keeps_existing_placeholders(text, spans):
+    masked, pii_map = _apply_mask(text, spans)
+    extra_text = masked + " " + text
+    extra_spans = [Span(s.start + len(masked) + 1, s.end + len(masked) + 1, s.entity_type) for s in spans]
+    masked_again, extended = _apply_mask(extra_text, extra_spans, pii_map)
+
+    assert all(extended[k] == v for k, v in pii_map.items())
+    assert deanonymize_text(masked_again, extended) == deanonymize_text(extra_text, pii_map)
+
+
+def test_overlapping_spans_merge_into_one_placeholder():
+    text = "Call Jonathan Smith today"
+    masked, pii_map = _apply_mask(text, [Span(5, 13, "PERSON"), Span(5, 19, "PERSON"), Span(10, 19, "PERSON")])
+    assert masked == "Call <PERSON_1> today"
+    assert pii_map == {"<PERSON_1>": "Jonathan Smith"}
+
+
+def test_longer_placeholders_are_unmasked_first():
+    pii_map = {f"<PERSON_{i}>": f"name{i}" for i in range(1, 12)}
+    assert deanonymize_text("<PERSON_1> and <PERSON_11>", pii_map) == "name1 and name11"
@@ -0,0 +1,40 @@
+import pytest
+
+from config import settings
+from services.privacy import _needs_ner
+
+
+@pytest.fixture(autouse=True)
+def tiered(monkeypatch):
+    monkeypatch.setattr(settings, "MASKING_TIER", "tiered")
+
+
+@pytest.mark.parametrize("text", [
+    "Please call John about the invoice.",
+    "Sarah asked for the report by Friday.",
+    "Sarah asked for the report.",
+    "John Smith wrote the doc.",
+    "Re: the plan. John Smith approved it.",
+    "Thanks for the update.\nBest,\nMaria",
+    "Hi Tom, the numbers look good.",
+    "The contract from O'Brien arrived.",
+    "Please forward it to McDonald before noon.",
+])
+def test_possible_names_go_to_ner(text):
+    assert _needs_ner(text)
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "Please send the report by Friday.",
+    "Thanks, I'll review it tomorrow. The numbers look good.",
+    "Your order has shipped. It arrives on Monday.",
+    "Call <PERSON_1> at <PHONE_NUMBER_1> about the PDF.",
+])
+def test_texts_without_names_skip_ner(text):
+    assert not _needs_ner(text)
+
+
+def test_ner_tier_always_runs(monkeypatch):
+    monkeypatch.setattr(settings, "MASKING_TIER", "ner")
+    assert _needs_ner("no names here")
@@ -0,0 +1,70 @@
+import pytest
+
+from services.html_text import available_backends, extract_text, extract_text_parts
+from services.reduction import reduce_text
+from services.tokens import estimate_tokens, truncate_to_tokens
+
+
+@pytest.fixture(params=available_backends())
+def backend(request):
+    return request.param
+
+
+def reduce_html(html: str, backend: str) -> str:
+    return reduce_text(extract_text(html, backend=backend, drop_quoted=True))
+
+
+def test_blocks_become_lines(backend):
+    html = "<p>First paragraph</p><div>Second <b>block</b></div>tail<br>after break"
+    assert extract_text(html, backend=backend) == "First paragraph\nSecond block\ntail\nafter break"
+
+
+def test_one_parse_returns_quoted_and_unquoted_text(backend):
+    html = '<p>New message here</p><div class="gmail_quote">On Mon Sam wrote:<blockquote>Old text</blockquote></div><p>After</p>'
+    text, unquoted_text = extract_text_parts(html, backend=backend)
+    assert text == "New message here\nOn Mon Sam wrote:\nOld text\nAfter"
+    assert unquoted_text == "New message here\nAfter"
+
+
+def test_content_next_to_a_footer_block_survives(backend):
+    html = "<p>Meeting moved to 3pm tomorrow.</p><p>Bring the draft contract and the signed NDA</p><p>© 2024 Acme Inc</p>"
+    assert reduce_html(html, backend) == "Meeting moved to 3pm tomorrow.\nBring the draft contract and the signed NDA"
+
+
+def test_footer_inside_a_paragraph_keeps_the_content_before_it(backend):
+    html = "<p>Please send the signed NDA back by Friday. You are receiving this email because you signed up.</p>"
+    assert reduce_html(html, backend) == "Please send the signed NDA back by Friday."
+
+
+def test_unpunctuated_email_ending_in_unsubscribe_keeps_its_content():
+    text = "hey can you send me the quarterly numbers before the call Unsubscribe"
+    assert reduce_text(text) == "hey can you send me the quarterly numbers before the call"
+
+
+def test_footer_only_lines_are_dropped():
+    text = "Your order has shipped and arrives Tuesday.\nUnsubscribe | Manage preferences\n© 2026 Shop Inc. All rights reserved."
+    assert reduce_text(text) == "Your order has shipped and arrives Tuesday."
+
+
+def test_plain_text_reply_drops_quotes_and_signature():
+    text = ("Thanks, I'll review the deck tomorrow morning.\n\n--\nJordan Smith | Director\n\n"
+            "On Mon, Jan 5, 2026 at 9:14 AM Bob <bob@example.com> wrote:\n> Here is the deck.\n> Let me know.")
+    assert reduce_text(text) == "Thanks, I'll review the deck tomorrow morning."
+
+
+def test_forward_without_new_text_keeps_its_content():
+    text = "---------- Original Message ----------\nFrom: Sam\nThe contract renewal terms are attached for your review."
+    assert "contract renewal terms" in reduce_text(text)
+
+
+def test_long_links_are_shortened_to_their_host():
+    text = "Track your parcel at https://track.example.com/p/0123456789abcdef0123456789abcdef?utm_source=mail today."
+    assert reduce_text(text) == "Track your parcel at [link: track.example.com] today."
+
+
+def test_truncate_to_tokens_respects_the_estimate():
+    text = "Meeting moved to 3pm tomorrow, bring the draft contract and the signed NDA. " * 20
+    truncated = truncate_to_tokens(text, 50)
+    assert estimate_tokens(truncated) <= 50
+    assert text.startswith(truncated)
+    assert truncate_to_tokens("short text", 50) == "short text"